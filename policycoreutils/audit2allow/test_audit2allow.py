@@ -1,6 +1,9 @@
 import unittest
 import os
+import json
+import socket
 import shutil
+import time
 from tempfile import mkdtemp
 from subprocess import Popen, PIPE
 
@@ -47,5 +50,49 @@ class Audit2allowTests(unittest.TestCase):
             print(out, err)
         self.assertSuccess("audit2why", p.returncode, err)
 
+    def request(self, path, request):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.connect(path)
+        f = s.makefile("rwb")
+        f.write((json.dumps(request) + "\n").encode("utf-8"))
+        f.flush()
+        reply = json.loads(f.readline().decode("utf-8"))
+        f.close()
+        s.close()
+        return reply
+
+    def test_audit2allow_server(self):
+        "Verify audit2allow --server answers requests one after another"
+        tmpdir = mkdtemp()
+        path = os.path.join(tmpdir, "audit2allow.socket")
+        server = Popen(['audit2allow', '--server', path], stdout=PIPE, stderr=PIPE)
+        try:
+            for i in range(100):
+                if os.path.exists(path):
+                    break
+                time.sleep(0.1)
+            fd = open("test.log")
+            log = fd.read()
+            fd.close()
+
+            reply = self.request(path, {"input": log})
+            self.assertEqual(reply["status"], 0)
+            self.assertTrue("smbd_t" in reply["output"])
+
+            # Nothing of the previous request may leak into the next.
+            avs = [["foo_t", "bar_t", "file", "read"]]
+            reply = self.request(path, {"avs": avs})
+            self.assertEqual(reply["status"], 0)
+            self.assertTrue("foo_t" in reply["output"])
+            self.assertFalse("smbd_t" in reply["output"])
+
+            for options in [{"report": "text"}, {"top": 5}, {"only_missing": True}]:
+                reply = self.request(path, {"avs": avs, "options": options})
+                self.assertEqual(reply["status"], 1)
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(tmpdir)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,76 @@
+#! /usr/bin/python -Es
+# Copyright (C) 2014 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# Time the startup of the semanage list commands and sepolicy --help,
+# which should not pay for loading the policy unless they use it.
+#
+#    This program is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU General Public License as
+#    published by the Free Software Foundation; either version 2 of
+#    the License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+#                                        02111-1307  USA
+import argparse
+import os
+import time
+from subprocess import Popen, PIPE
+
+object_list = ['login', 'user', 'port', 'module', 'interface', 'node', 'fcontext', 'boolean', 'permissive', "dontaudit"]
+
+
+def run(cmd):
+    start = time.time()
+    try:
+        p = Popen(cmd, stdout=PIPE, stderr=PIPE)
+    except OSError:
+        return None, None
+    p.communicate()
+    return time.time() - start, p.returncode
+
+
+def bench(cmd, runs):
+    times = []
+    rc = 0
+    for i in range(runs):
+        t, rc = run(cmd)
+        if t is None:
+            return None, None, None
+        times.append(t)
+    times.sort()
+    return times[0], times[len(times) // 2], rc
+
+
+def gen_commands(objects):
+    commands = []
+    for o in objects:
+        commands.append(['semanage', o, '-l'])
+    commands.append(['sepolicy', '--help'])
+    return commands
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Time the startup of semanage and sepolicy')
+    parser.add_argument('-n', "--runs", dest="runs", type=int, default=5,
+                        help="number of runs of each command")
+    parser.add_argument('objects', nargs="*", default=object_list,
+                        help="semanage objects to list")
+    args = parser.parse_args()
+
+    print("%-30s %10s %10s" % ("command", "min (s)", "median (s)"))
+    for cmd in gen_commands(args.objects):
+        fastest, median, rc = bench(cmd, args.runs)
+        if fastest is None:
+            print("%-30s %s" % (" ".join(cmd), "not found"))
+            continue
+        status = ""
+        if rc != 0:
+            status = " (exit status %d)" % rc
+        print("%-30s %10.3f %10.3f%s" % (" ".join(cmd), fastest, median, status))
@@ -203,6 +203,32 @@ def untranslate(trans, prepend=1):
         return raw
 
 
+class attributeTypes(object):
+
+    """
+    Class attribute holding the types of policy attributes. The policy is
+    queried on first use rather than when seobject is imported, which
+    would load the whole policy for every semanage command.
+    """
+
+    def __init__(self, attributes, extra=[]):
+        self.attributes = attributes
+        self.extra = extra
+        self.types = None
+
+    def __get__(self, obj, cls=None):
+        if self.types is None:
+            try:
+                types = []
+                for a in self.attributes:
+                    types += sepolicy.info(sepolicy.ATTRIBUTE, a)[0]["types"]
+                types += self.extra
+            except RuntimeError:
+                types = []
+            self.types = types
+        return self.types
+
+
 class semanageRecords:
     transaction = False
     handle = None
@@ -1015,10 +1041,7 @@ class seluserRecords(semanageRecords):
 
 
 class portRecords(semanageRecords):
-    try:
-        valid_types = sepolicy.info(sepolicy.ATTRIBUTE, "port_type")[0]["types"]
-    except RuntimeError:
-        valid_types = []
+    valid_types = attributeTypes(["port_type"])
 
     def __init__(self, store=""):
         semanageRecords.__init__(self, store)
@@ -1278,10 +1301,7 @@ class portRecords(semanageRecords):
 
 
 class nodeRecords(semanageRecords):
-    try:
-        valid_types = sepolicy.info(sepolicy.ATTRIBUTE, "node_type")[0]["types"]
-    except RuntimeError:
-        valid_types = []
+    valid_types = attributeTypes(["node_type"])
 
     def __init__(self, store=""):
         semanageRecords.__init__(self, store)
@@ -1703,12 +1723,7 @@ class interfaceRecords(semanageRecords):
 
 
 class fcontextRecords(semanageRecords):
-    try:
-        valid_types = sepolicy.info(sepolicy.ATTRIBUTE, "file_type")[0]["types"]
-        valid_types += sepolicy.info(sepolicy.ATTRIBUTE, "device_node")[0]["types"]
-        valid_types.append("<<none>>")
-    except RuntimeError:
-        valid_types = []
+    valid_types = attributeTypes(["file_type", "device_node"], ["<<none>>"])
 
     def __init__(self, store=""):
         semanageRecords.__init__(self, store)
@@ -76,7 +76,7 @@ _sepolicy () {
                [TRANSITION]='transition'
         )
 
-        COMMONOPTS='-P --policy -h --help'
+        COMMONOPTS='-P --policy --cache -h --help'
         local -A OPTS=(
                [booleans]='-h --help -p --path -a -all -b --boolean'
                [communicate]='-h --help -s --source -t --target -c --class -S --sourceaccess -T --targetaccess'
@@ -84,7 +84,7 @@ _sepolicy () {
                [gui]='-h --help'
                [interface]='-h --help -a --list_admin -c --compile -i --interface -l --list -u --list_user -u --list_user -v --verbose'
                [manpage]='-h --help -p --path -a -all -o --os -d --domain -w --web -r --root'
-               [network]='-h --help -d --domain -l --list -p --port -t --type '
+               [network]='-h --help -d --domain -l --list -p --port -t --type --all-domains --format '
                [transition]='-h --help -s --source -t --target'
         )
 
@@ -180,6 +180,10 @@ _sepolicy () {
                 COMPREPLY=( $(compgen -W "$( __get_all_domain_types )" -- "$cur") )
                 return 0
             fi
+            if [ "$prev" = "--format" ]; then
+                COMPREPLY=( $(compgen -W "csv json" -- "$cur") )
+                return 0
+            fi
             COMPREPLY=( $(compgen -W '${OPTS[$verb]}' -- "$cur") )
             return 0
         elif [ "$verb" = "transition" ]; then
@@ -176,6 +176,13 @@ class LoadPolicy(argparse.Action):
         setattr(namespace, self.dest, values)
 
 
+class EnableCache(argparse.Action):
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        sepolicy.enable_persistent_cache()
+        setattr(namespace, self.dest, True)
+
+
 class CheckPolicyType(argparse.Action):
 
     def __call__(self, parser, namespace, values, option_string=None):
@@ -273,26 +280,39 @@ def _print_net(src, protocol, perm):
             print "\t" + p
 
 
+def _print_network_matrix(fmt):
+    import sepolicy.network
+    fields = ["domain", "protocol", "permission", "type", "ports", "booleans"]
+    rows = sepolicy.network.get_network_matrix()
+    if fmt == "json":
+        import json
+        sep = "[\n"
+        for row in rows:
+            sys.stdout.write(sep + json.dumps(dict(zip(fields, row)), sort_keys=True))
+            sep = ",\n"
+        if sep == "[\n":
+            sys.stdout.write(sep)
+        sys.stdout.write("\n]\n")
+    else:
+        import csv
+        writer = csv.writer(sys.stdout)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(list(row[:4]) + [", ".join(row[4]), " ".join(row[5])])
+
+
 def network(args):
-    portrecs, portrecsbynum = sepolicy.gen_port_dict()
-    all_ports = []
+    from sepolicy.ports import format_range
+    index = sepolicy.get_port_index()
     if args.list_ports:
-        for i in portrecs:
-            if i[0] not in all_ports:
-                all_ports.append(i[0])
-        all_ports.sort()
-        print "\n".join(all_ports)
+        print "\n".join(index.get_types())
 
     for port in args.port:
         found = False
-        for i in portrecsbynum:
-            if i[0] <= port and port <= i[1]:
-                if i[0] == i[1]:
-                    range = i[0]
-                else:
-                    range = "%s-%s" % (i[0], i[1])
+        for protocol in sorted(index.get_protocols()):
+            for rec in index.lookup_all(port, protocol):
                 found = True
-                print "%d: %s %s %s" % (port, i[2], portrecsbynum[i][0], range)
+                print "%d: %s %s %s" % (port, protocol, rec[3], format_range(rec[0], rec[1]))
         if not found:
             if port < 500:
                 print "Undefined reserved port type"
@@ -300,10 +320,10 @@ def network(args):
                 print "Undefined port type"
 
     for t in args.type:
-        if (t, 'tcp') in portrecs.keys():
-            print "%s: tcp: %s" % (t, ",".join(portrecs[t, 'tcp']))
-        if (t, 'udp') in portrecs.keys():
-            print "%s: udp: %s" % (t, ",".join(portrecs[t, 'udp']))
+        for protocol in ['tcp', 'udp']:
+            port_strings = index.get_port_strings(t, protocol)
+            if port_strings:
+                print "%s: %s: %s" % (t, protocol, ",".join(port_strings))
 
     for a in args.applications:
         d = sepolicy.get_init_transtype(a)
@@ -315,6 +335,9 @@ def network(args):
         for net in ("tcp", "udp"):
             _print_net(d, net, "name_bind")
 
+    if args.all_domains:
+        _print_network_matrix(args.format)
+
 
 def gui_run(args):
     try:
@@ -402,6 +425,12 @@ def gen_network_args(parser):
     group.add_argument("-a", "--application", dest="applications", default=[],
                        nargs="+",
                        help=_("show ports to which this application can bind and/or connect"))
+    group.add_argument("--all-domains", dest="all_domains",
+                       action="store_true",
+                       help=_("report the ports to which every domain can bind and/or connect"))
+    net.add_argument("--format", dest="format", default="csv",
+                     choices=["csv", "json"],
+                     help=_("format of the --all-domains report"))
     net.set_defaults(func=network)
 
 
@@ -674,6 +703,9 @@ if __name__ == '__main__':
     parser.add_argument("-P", "--policy", dest="policy",
                         action=LoadPolicy,
                         default=None, help=_("Alternate SELinux policy, defaults to /sys/fs/selinux/policy"))
+    parser.add_argument("--cache", dest="cache", nargs=0,
+                        action=EnableCache, default=False,
+                        help=_("Use and save the cached results of earlier policy queries"))
     gen_booleans_args(subparsers)
     gen_communicate_args(subparsers)
     gen_generate_args(subparsers)
@@ -4,6 +4,12 @@
 # Author: Ryan Hallisey <rhallise@redhat.com>
 
 import _policy
+import bisect
+import caching
+import filecontexts
+import hashlib
+import ports
+import rulestore
 import selinux
 import glob
 PROGNAME = "policycoreutils"
@@ -42,27 +48,115 @@ TRANSITION = 'transition'
 ROLE_ALLOW = 'role_allow'
 
 
+policy_file = None
+policy_loaded = False
+# file_key of the installed policy, if that is the loaded policy
+installed_policy_key = None
+# Bumped on every policy load - the key of the cache entries computed
+# from the policy.
+policy_generation = 0
+
+# The results computed from the policy and the configuration files.
+# Each entry is keyed by policy_key() or by the file_key of the files it
+# was read from, so it is recomputed when they change.
+cache = caching.Cache()
+
+# Directory to save the results computed from the loaded policy in, for
+# later processes using the same policy (see enable_persistent_cache).
+persistent_cache_dir = None
+loaded_policy_file = None
+
+
+def init_policy():
+    # The installed policy is loaded the first time it is used rather
+    # than when sepolicy is imported, so that users of seobject which
+    # never look at the policy (e.g., semanage login -l) do not pay for
+    # reading it.
+    global policy_file
+    global policy_loaded
+    global installed_policy_key
+    if policy_loaded:
+        return
+    try:
+        policy_file = get_installed_policy()
+        policy(policy_file)
+        installed_policy_key = caching.file_key(policy_file)
+    except ValueError, e:
+        if selinux.is_selinux_enabled() == 1:
+            raise e
+    policy_loaded = True
+
+
+def policy_key():
+    global policy_loaded
+    # Reload the installed policy if it was rebuilt (e.g., by semodule)
+    # since it was loaded, so long running users see the new policy.
+    if installed_policy_key is not None and caching.file_key(policy_file) != installed_policy_key:
+        policy_loaded = False
+    init_policy()
+    return policy_generation
+
+
+def enable_persistent_cache(directory=None):
+    # Off unless asked for (sepolicy --cache): the results are loaded
+    # with marshal, so only files private to the user are used (see
+    # caching.is_private).
+    global persistent_cache_dir
+    if directory is None:
+        directory = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "sepolicy")
+    persistent_cache_dir = directory
+
+
+def get_policy_store():
+    if persistent_cache_dir is None or loaded_policy_file is None:
+        return None
+    try:
+        return cache.get("policy_store",
+                         lambda: caching.PolicyStore(persistent_cache_dir, loaded_policy_file),
+                         (policy_key(), persistent_cache_dir))
+    except IOError:
+        return None
+
+
+def cache_policy_result(name, compute):
+    # Results computed from the policy are also saved in and loaded
+    # from the persistent cache, if it is enabled.
+    def read():
+        store = get_policy_store()
+        if store is None:
+            return compute()
+        return store.get(name, compute)
+    return cache.get(name, read, policy_key())
+
+
 def info(setype, name=None):
+    init_policy()
     dict_list = _policy.info(setype, name)
     return dict_list
 
 
+def get_rule_store():
+    return cache.get("rule_store", lambda: rulestore.RuleStore(*get_attribute_index()), policy_key())
+
+
 def search(types, info={}):
-    seinfo = info
     valid_types = [ALLOW, AUDITALLOW, NEVERALLOW, DONTAUDIT, TRANSITION, ROLE_ALLOW]
     for setype in types:
         if setype not in valid_types:
             raise ValueError("Type has to be in %s" % valid_types)
-        seinfo[setype] = True
 
-    perms = []
-    if PERMS in seinfo:
-        perms = info[PERMS]
-        seinfo[PERMS] = ",".join(seinfo[PERMS])
-
-    dict_list = _policy.search(seinfo)
-    if dict_list and len(perms) != 0:
-        dict_list = filter(lambda x: _dict_has_perms(x, perms), dict_list)
+    seinfo = dict(info)
+    if isinstance(seinfo.get(PERMS), str):
+        seinfo[PERMS] = seinfo[PERMS].split(",")
+
+    # Answered from the indexed rules rather than a query per call.
+    store = get_rule_store()
+    dict_list = []
+    for setype in valid_types:
+        if setype in types:
+            dict_list += store.search(setype, seinfo)
+    if len(dict_list) == 0:
+        return None
     return dict_list
 
 
@@ -95,8 +189,34 @@ def get_conditionals_format_text(cond):
     return _("-- Allowed %s [ %s ]") % (enabled, " || ".join(set(map(lambda x: "%s=%d" % (x['boolean'][0][0], x['boolean'][0][1]), cond))))
 
 
+def read_attribute_index():
+    attribute_types = {}
+    type_attributes = {}
+    for a in info(ATTRIBUTE):
+        attribute_types[a["name"]] = a["types"]
+        for t in a["types"]:
+            if t in type_attributes:
+                type_attributes[t].append(a["name"])
+            else:
+                type_attributes[t] = [a["name"]]
+    return (attribute_types, type_attributes)
+
+
+def get_attribute_index():
+    # Maps of every attribute to its types and of every type to its
+    # attributes, read with a single policy query.
+    return cache_policy_result("attribute_index", read_attribute_index)
+
+
 def get_types_from_attribute(attribute):
-    return info(ATTRIBUTE, attribute)[0]["types"]
+    try:
+        return get_attribute_index()[0][attribute]
+    except KeyError:
+        raise RuntimeError(_("%s is not an attribute") % attribute)
+
+
+def get_attributes_from_type(setype):
+    return get_attribute_index()[1].get(setype, [])
 
 file_type_str = {}
 file_type_str["a"] = _("all files")
@@ -108,23 +228,22 @@ file_type_str["s"] = _("socket file")
 file_type_str["l"] = _("symbolic link")
 file_type_str["p"] = _("named pipe")
 
-trans_file_type_str = {}
-trans_file_type_str[""] = "a"
-trans_file_type_str["--"] = "f"
-trans_file_type_str["-d"] = "d"
-trans_file_type_str["-c"] = "c"
-trans_file_type_str["-b"] = "b"
-trans_file_type_str["-s"] = "s"
-trans_file_type_str["-l"] = "l"
-trans_file_type_str["-p"] = "p"
+trans_file_type_str = filecontexts.trans_file_type_str
+
+
+def get_sorted_file_types():
+    return cache.get("sorted_file_types", lambda: sorted(get_all_file_types()), policy_key())
 
 
 def get_file_types(setype):
     flist = []
     mpaths = {}
-    for f in get_all_file_types():
-        if f.startswith(gen_short_name(setype)):
-            flist.append(f)
+    prefix = gen_short_name(setype)
+    file_types = get_sorted_file_types()
+    for f in file_types[bisect.bisect_left(file_types, prefix):]:
+        if not f.startswith(prefix):
+            break
+        flist.append(f)
     fcdict = get_fcdict()
     for f in flist:
         try:
@@ -135,8 +254,7 @@ def get_file_types(setype):
 
 
 def get_writable_files(setype):
-    all_attributes = get_all_attributes()
-    file_types = get_all_file_types()
+    file_types = set(get_all_file_types())
     all_writes = []
     mpaths = {}
     permlist = search([ALLOW], {'source': setype, 'permlist': ['open', 'write'], 'class': 'file'})
@@ -176,57 +294,45 @@ import sys
 
 
 def find_file(reg):
-    if os.path.exists(reg):
-        return [reg]
-    try:
-        pat = re.compile(r"%s$" % reg)
-    except:
-        print "bad reg:", reg
-        return []
-    p = reg
-    if p.endswith("(/.*)?"):
-        p = p[:-6] + "/"
-
-    path = os.path.dirname(p)
-
-    try:                       # Bug fix: when "all files on system"
-        if path[-1] != "/":    # is pass in it breaks without try block
-            path += "/"
-    except IndexError:
-        print "try failed got an IndexError"
-        pass
-
-    try:
-        pat = re.compile(r"%s$" % reg)
-        return filter(pat.match, map(lambda x: path + x, os.listdir(path)))
-    except:
-        return []
+    return filecontexts.find_files([reg])[reg]
 
 
 def find_all_files(domain, exclude_list=[]):
-    all_entrypoints = []
     executable_files = get_entrypoints(domain)
+    exes = []
+    regexes = []
     for exe in executable_files.keys():
-        if exe.endswith("_exec_t") and exe not in exclude_list:
-            for path in executable_files[exe]:
-                for f in find_file(path):
-                    return f
-                    #all_entrypoints.append(f)
+        if exe.endswith("_exec_t") and exe not in exclude_list and executable_files[exe]:
+            exes.append(exe)
+            regexes += executable_files[exe][0]
+    found = filecontexts.find_files(regexes)
+    for exe in exes:
+        for path in executable_files[exe][0]:
+            for f in found[path]:
+                return f
     return None
 
-#return all_entrypoints
+
+def find_entrypoint_paths(exes, exclude_list=[], threads=1):
+    # A path that exists for each of the entrypoint types, found with
+    # one listing of each of the directories of all of their regexes.
+    fcontexts = get_file_contexts()
+    exes = filter(lambda x: x.endswith("_exec_t") and x not in exclude_list, exes)
+    regexes = []
+    for exe in exes:
+        regexes += fcontexts.get_regexes(exe)
+    found = filecontexts.find_files(regexes, threads)
+    paths = {}
+    for exe in exes:
+        for path in fcontexts.get_regexes(exe):
+            if found[path]:
+                paths[exe] = found[path][0]
+                break
+    return paths
 
 
 def find_entrypoint_path(exe, exclude_list=[]):
-    fcdict = get_fcdict()
-    try:
-        if exe.endswith("_exec_t") and exe not in exclude_list:
-            for path in fcdict[exe]["regex"]:
-                for f in find_file(path):
-                    return f
-    except KeyError:
-        pass
-    return None
+    return find_entrypoint_paths([exe], exclude_list).get(exe)
 
 
 def read_file_equiv(edict, fc_path, modify):
@@ -238,35 +344,29 @@ def read_file_equiv(edict, fc_path, modify):
         edict[f[0]] = {"equiv": f[1], "modify": modify}
     return edict
 
-file_equiv_modified = None
-
 
 def get_file_equiv_modified(fc_path=selinux.selinux_file_context_path()):
-    global file_equiv_modified
-    if file_equiv_modified:
-        return file_equiv_modified
-    file_equiv_modified = {}
-    file_equiv_modified = read_file_equiv(file_equiv_modified, fc_path + ".subs", modify=True)
-    return file_equiv_modified
-
-file_equiv = None
+    return cache.get(("file_equiv_modified", fc_path),
+                     lambda: read_file_equiv({}, fc_path + ".subs", modify=True),
+                     caching.file_key(fc_path + ".subs"))
 
 
 def get_file_equiv(fc_path=selinux.selinux_file_context_path()):
-    global file_equiv
-    if file_equiv:
-        return file_equiv
-    file_equiv = get_file_equiv_modified(fc_path)
-    file_equiv = read_file_equiv(file_equiv, fc_path + ".subs_dist", modify=False)
-    return file_equiv
-
-local_files = None
+    def compute():
+        # A copy - the modified equivalences are cached on their own.
+        file_equiv = dict(get_file_equiv_modified(fc_path))
+        return read_file_equiv(file_equiv, fc_path + ".subs_dist", modify=False)
+    return cache.get(("file_equiv", fc_path), compute,
+                     caching.file_key(fc_path + ".subs", fc_path + ".subs_dist"))
 
 
 def get_local_file_paths(fc_path=selinux.selinux_file_context_path()):
-    global local_files
-    if local_files:
-        return local_files
+    return cache.get(("local_files", fc_path),
+                     lambda: read_local_file_paths(fc_path),
+                     caching.file_key(fc_path + ".local"))
+
+
+def read_local_file_paths(fc_path):
     local_files = []
     fd = open(fc_path + ".local", "r")
     fc = fd.readlines()
@@ -286,39 +386,45 @@ def get_local_file_paths(fc_path=selinux.selinux_file_context_path()):
             pass
     return local_files
 
-fcdict = None
+
+def get_file_contexts(fc_path=selinux.selinux_file_context_path()):
+    paths = [fc_path, fc_path + ".homedirs", fc_path + ".local"]
+    key = caching.file_key(*paths)
+    return cache.get(("file_contexts", fc_path),
+                     lambda: filecontexts.FileContexts(read_file_context_specs(paths, key)),
+                     key)
+
+
+def read_file_context_specs(paths, key):
+    # The specifications are also saved in the persistent cache, if it
+    # is enabled, until the files change.
+    if persistent_cache_dir is None:
+        return filecontexts.read_specs(paths)
+    name = "file_contexts-%s" % hashlib.sha1(paths[0]).hexdigest()
+    store = caching.ResultFile(os.path.join(persistent_cache_dir, name), key)
+    return store.get(lambda: filecontexts.read_specs(paths))
+
+
+def match_file_context(path, ftype=None, fc_path=selinux.selinux_file_context_path()):
+    # The (regex, file type, type) of the specification that labels
+    # path, or None.
+    return get_file_contexts(fc_path).match(path, ftype)
 
 
 def get_fcdict(fc_path=selinux.selinux_file_context_path()):
-    global fcdict
-    if fcdict:
-        return fcdict
-    fd = open(fc_path, "r")
-    fc = fd.readlines()
-    fd.close()
-    fd = open(fc_path + ".homedirs", "r")
-    fc += fd.readlines()
-    fd.close()
-    fcdict = {}
-    fd = open(fc_path + ".local", "r")
-    fc += fd.readlines()
-    fd.close()
+    return cache.get(("fcdict", fc_path), lambda: read_fcdict(fc_path),
+                     caching.file_key(fc_path, fc_path + ".homedirs", fc_path + ".local"))
 
-    for i in fc:
-        rec = i.split()
-        try:
-            if len(rec) > 2:
-                ftype = trans_file_type_str[rec[1]]
-            else:
-                ftype = "a"
 
-            t = rec[-1].split(":")[2]
-            if t in fcdict:
-                fcdict[t]["regex"].append(rec[0])
-            else:
-                fcdict[t] = {"regex": [rec[0]], "ftype": ftype}
-        except:
-            pass
+def read_fcdict(fc_path):
+    fcdict = {}
+    for regex, ftype, t in get_file_contexts(fc_path).specs:
+        if t is None:
+            continue
+        if t in fcdict:
+            fcdict[t]["regex"].append(regex)
+        else:
+            fcdict[t] = {"regex": [regex], "ftype": ftype}
 
     fcdict["logfile"] = {"regex": ["all log files"]}
     fcdict["user_tmp_type"] = {"regex": ["all user tmp files"]}
@@ -436,15 +542,14 @@ def get_installed_policy(root="/"):
         pass
     raise ValueError(_("No SELinux Policy installed"))
 
-methods = []
-
 
 def get_methods():
-    global methods
-    if len(methods) > 0:
-        return methods
     gen_interfaces()
     fn = defaults.interface_info()
+    return cache.get("methods", lambda: read_methods(fn), caching.file_key(fn))
+
+
+def read_methods(fn):
     try:
         fd = open(fn)
     # List of per_role_template interfaces
@@ -459,31 +564,20 @@ def get_methods():
     methods.sort()
     return methods
 
-all_types = None
-
 
 def get_all_types():
-    global all_types
-    if all_types == None:
-        all_types = map(lambda x: x['name'], info(TYPE))
-    return all_types
-
-user_types = None
+    return cache_policy_result("all_types", lambda: map(lambda x: x['name'], info(TYPE)))
 
 
 def get_user_types():
-    global user_types
-    if user_types == None:
-        user_types = info(ATTRIBUTE, "userdomain")[0]["types"]
-    return user_types
-
-role_allows = None
+    return cache_policy_result("user_types", lambda: list(get_types_from_attribute("userdomain")))
 
 
 def get_all_role_allows():
-    global role_allows
-    if role_allows:
-        return role_allows
+    return cache_policy_result("role_allows", read_role_allows)
+
+
+def read_role_allows():
     role_allows = {}
     for r in search([ROLE_ALLOW]):
         if r["source"] == "system_r" or r["target"] == "system_r":
@@ -508,9 +602,6 @@ def get_all_entrypoint_domains():
                 all_domains.append(m[0])
     return all_domains
 
-portrecs = None
-portrecsbynum = None
-
 
 def gen_interfaces():
     import commands
@@ -529,71 +620,70 @@ def gen_interfaces():
 
 
 def gen_port_dict():
-    global portrecs
-    global portrecsbynum
-    if portrecs:
-        return (portrecs, portrecsbynum)
+    return cache_policy_result("port_dict", read_port_dict)
+
+
+def read_port_dict():
     portrecsbynum = {}
     portrecs = {}
-    for i in info(PORT):
-        if i['low'] == i['high']:
-            port = str(i['low'])
-        else:
-            port = "%s-%s" % (str(i['low']), str(i['high']))
+    for low, high, protocol, setype, mls in get_port_records():
+        port = ports.format_range(low, high)
 
-        if (i['type'], i['protocol']) in portrecs:
-            portrecs[(i['type'], i['protocol'])].append(port)
+        if (setype, protocol) in portrecs:
+            portrecs[(setype, protocol)].append(port)
         else:
-            portrecs[(i['type'], i['protocol'])] = [port]
+            portrecs[(setype, protocol)] = [port]
 
-        if 'range' in i:
-            portrecsbynum[(i['low'], i['high'], i['protocol'])] = (i['type'], i['range'])
+        if mls is not None:
+            portrecsbynum[(low, high, protocol)] = (setype, mls)
         else:
-            portrecsbynum[(i['low'], i['high'], i['protocol'])] = (i['type'])
+            portrecsbynum[(low, high, protocol)] = (setype)
 
     return (portrecs, portrecsbynum)
 
-all_domains = None
 
+def get_port_records():
+    # (low, high, protocol, type, mls range) of each port context
+    return cache_policy_result("port_records", lambda: map(lambda i: (i['low'], i['high'], i['protocol'], i['type'], i.get('range')), info(PORT)))
 
-def get_all_domains():
-    global all_domains
-    if not all_domains:
-        all_domains = info(ATTRIBUTE, "domain")[0]["types"]
-    return all_domains
 
-roles = None
+def get_port_index():
+    return cache.get("port_index", lambda: ports.PortIndex(get_port_records()), policy_key())
 
 
-def get_all_roles():
-    global roles
-    if roles:
-        return roles
+def get_all_domains():
+    return cache_policy_result("all_domains", lambda: list(get_types_from_attribute("domain")))
+
+
+def read_roles():
     roles = map(lambda x: x['name'], info(ROLE))
     roles.remove("object_r")
     roles.sort()
     return roles
 
-selinux_user_list = None
+
+def get_all_roles():
+    return cache_policy_result("roles", read_roles)
 
 
-def get_selinux_users():
-    global selinux_user_list
-    if not selinux_user_list:
-        selinux_user_list = info(USER)
-        for x in selinux_user_list:
-            x['range'] = "".join(x['range'].split(" "))
+def read_selinux_users():
+    selinux_user_list = info(USER)
+    for x in selinux_user_list:
+        x['range'] = "".join(x['range'].split(" "))
     return selinux_user_list
 
-login_mappings = None
+
+def get_selinux_users():
+    return cache_policy_result("selinux_users", read_selinux_users)
 
 
 def get_login_mappings():
-    global login_mappings
-    if login_mappings:
-        return login_mappings
+    path = selinux.selinux_usersconf_path()
+    return cache.get("login_mappings", lambda: read_login_mappings(path), caching.file_key(path))
+
 
-    fd = open(selinux.selinux_usersconf_path(), "r")
+def read_login_mappings(path):
+    fd = open(path, "r")
     buf = fd.read()
     fd.close()
     login_mappings = []
@@ -611,36 +701,21 @@ def get_all_users():
     users.sort()
     return users
 
-file_types = None
 
+def get_attribute_types_sorted(attribute):
+    return sorted(get_types_from_attribute(attribute))
 
-def get_all_file_types():
-    global file_types
-    if file_types:
-        return file_types
-    file_types = info(ATTRIBUTE, "file_type")[0]["types"]
-    file_types.sort()
-    return file_types
 
-port_types = None
+def get_all_file_types():
+    return cache_policy_result("file_types", lambda: get_attribute_types_sorted("file_type"))
 
 
 def get_all_port_types():
-    global port_types
-    if port_types:
-        return port_types
-    port_types = info(ATTRIBUTE, "port_type")[0]["types"]
-    port_types.sort()
-    return port_types
-
-bools = None
+    return cache_policy_result("port_types", lambda: get_attribute_types_sorted("port_type"))
 
 
 def get_all_bools():
-    global bools
-    if not bools:
-        bools = info(BOOLEAN)
-    return bools
+    return cache_policy_result("bools", lambda: info(BOOLEAN))
 
 
 def prettyprint(f, trim):
@@ -760,46 +835,25 @@ def get_description(f, markup=markup):
 
     return txt + "treat the files as %s data." % prettyprint(f, "_t")
 
-all_attributes = None
-
 
 def get_all_attributes():
-    global all_attributes
-    if not all_attributes:
-        all_attributes = map(lambda x: x['name'], info(ATTRIBUTE))
-    return all_attributes
+    return cache_policy_result("all_attributes", lambda: sorted(get_attribute_index()[0]))
 
 
 def policy(policy_file):
-    global all_domains
-    global all_attributes
-    global bools
-    global all_types
-    global role_allows
-    global users
-    global roles
-    global file_types
-    global port_types
-    all_domains = None
-    all_attributes = None
-    bools = None
-    all_types = None
-    role_allows = None
-    users = None
-    roles = None
-    file_types = None
-    port_types = None
+    global policy_loaded
+    global installed_policy_key
+    global policy_generation
+    global loaded_policy_file
+    # Everything cached from the old policy is out of date.
+    policy_generation += 1
+    installed_policy_key = None
     try:
         _policy.policy(policy_file)
     except:
         raise ValueError(_("Failed to read %s policy file") % policy_file)
-
-try:
-    policy_file = get_installed_policy()
-    policy(policy_file)
-except ValueError, e:
-    if selinux.is_selinux_enabled() == 1:
-        raise e
+    loaded_policy_file = policy_file
+    policy_loaded = True
 
 
 def _dict_has_perms(dict, perms):
@@ -844,16 +898,10 @@ def get_bools(setype):
                     bools.append((b[0], enabled))
     return (domainbools, bools)
 
-booleans = None
-
 
 def get_all_booleans():
-    global booleans
-    if not booleans:
-        booleans = selinux.security_get_boolean_names()[1]
-    return booleans
+    return cache.get("booleans", lambda: selinux.security_get_boolean_names()[1], policy_key())
 
-booleans_dict = None
 import gzip
 
 
@@ -870,9 +918,11 @@ def policy_xml(path="/usr/share/selinux/devel/policy.xml"):
 
 
 def gen_bool_dict(path="/usr/share/selinux/devel/policy.xml"):
-    global booleans_dict
-    if booleans_dict:
-        return booleans_dict
+    return cache.get(("booleans_dict", path), lambda: read_bool_dict(path),
+                     caching.file_key(path))
+
+
+def read_bool_dict(path):
     import xml.etree.ElementTree
     import re
     booleans_dict = {}
@@ -940,41 +990,6 @@ def get_os_version():
 
 
 def reinit():
-    global all_attributes
-    global all_domains
-    global all_types
-    global booleans
-    global booleans_dict
-    global bools
-    global fcdict
-    global file_types
-    global local_files
-    global methods
-    global methods
-    global portrecs
-    global portrecsbynum
-    global port_types
-    global role_allows
-    global roles
-    global login_mappings
-    global selinux_user_list
-    global user_types
-    all_attributes = None
-    all_domains = None
-    all_types = None
-    booleans = None
-    booleans_dict = None
-    bools = None
-    fcdict = None
-    file_types = None
-    local_files = None
-    methods = None
-    methods = None
-    portrecs = None
-    portrecsbynum = None
-    port_types = None
-    role_allows = None
-    roles = None
-    user_types = None
-    login_mappings = None
-    selinux_user_list = None
+    # Drop everything, including the results that are not keyed by a
+    # file, e.g., the boolean names from the kernel.
+    cache.invalidate()
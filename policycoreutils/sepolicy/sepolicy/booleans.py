@@ -28,7 +28,7 @@ info = sepolicy.info
 
 def expand_attribute(attribute):
     try:
-        return info(sepolicy.ATTRIBUTE, attribute)[0]["types"]
+        return sepolicy.get_types_from_attribute(attribute)
     except RuntimeError:
         return [attribute]
 
@@ -0,0 +1,200 @@
+# Copyright (C) 2014 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# caching holds the results that sepolicy computes from the policy and
+# the policy configuration files
+#
+#    This program is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU General Public License as
+#    published by the Free Software Foundation; either version 2 of
+#    the License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+#                                        02111-1307  USA
+#
+#
+import hashlib
+import marshal
+import os
+import tempfile
+
+STORE_VERSION = 1
+
+
+def file_key(*paths):
+    # Changes when any of the files is modified, replaced or removed.
+    key = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            key.append((path, st.st_ino, st.st_mtime, st.st_size))
+        except OSError:
+            key.append((path, None))
+    return tuple(key)
+
+
+class Cache:
+
+    """
+    Named cache entries. Each entry is stored with the key it was
+    computed for - e.g., the generation of the loaded policy or the
+    file_key of the files it was read from - and is computed again when
+    it is looked up with a different key. If maxsize is set, the least
+    recently used entries are evicted to keep at most maxsize entries.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.entries = {}
+        self.clock = 0
+
+    def get(self, name, compute, key=None):
+        self.clock += 1
+        e = self.entries.get(name)
+        if e is not None and e[0] == key:
+            e[2] = self.clock
+            return e[1]
+        value = compute()
+        self.entries[name] = [key, value, self.clock]
+        if self.maxsize is not None:
+            self.__evict()
+        return value
+
+    def __evict(self):
+        while len(self.entries) > self.maxsize:
+            oldest = min(self.entries, key=lambda n: self.entries[n][2])
+            del self.entries[oldest]
+
+    def invalidate(self, name=None):
+        if name is None:
+            self.entries = {}
+        elif name in self.entries:
+            del self.entries[name]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    fd = open(path, "rb")
+    try:
+        buf = fd.read(1 << 16)
+        while buf:
+            h.update(buf)
+            buf = fd.read(1 << 16)
+    finally:
+        fd.close()
+    return h.hexdigest()
+
+
+def is_private(path):
+    # marshal data must only be loaded from files that no one but the
+    # user could have written: owned by the user and not writable by
+    # anyone else, in a directory that is the same.
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return st.st_uid == os.geteuid() and not st.st_mode & 022
+
+
+class ResultFile:
+
+    """
+    One result computed from files, saved in a file with the file_key of
+    the files it was computed from so that it is not used once they
+    change. The file is only loaded if it and its directory are private
+    to the user (see is_private).
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+
+    def __load(self):
+        if not is_private(os.path.dirname(self.path)) or not is_private(self.path):
+            return None
+        try:
+            fd = open(self.path, "rb")
+            try:
+                data = marshal.load(fd)
+            finally:
+                fd.close()
+        except (IOError, EOFError, ValueError, TypeError):
+            return None
+        if isinstance(data, tuple) and len(data) == 3 and data[:2] == (STORE_VERSION, self.key):
+            return data
+        return None
+
+    def __save(self, value):
+        directory = os.path.dirname(self.path)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory, 0700)
+            if not is_private(directory):
+                return
+            fd, tmp = tempfile.mkstemp(dir=directory)
+            f = os.fdopen(fd, "wb")
+            try:
+                marshal.dump((STORE_VERSION, self.key, value), f)
+            finally:
+                f.close()
+            os.rename(tmp, self.path)
+        except (OSError, IOError, ValueError):
+            # The results are only an optimization.
+            pass
+
+    def get(self, compute):
+        data = self.__load()
+        if data is not None:
+            return data[2]
+        value = compute()
+        self.__save(value)
+        return value
+
+
+class PolicyStore:
+
+    """
+    Results computed from a policy file, saved in a directory so that
+    later processes can load them instead of querying the policy again.
+    Each result is a ResultFile named after the hash of the policy file
+    and the result, so they are not used once the policy changes. Only
+    the results for the latest policy are kept.
+    """
+
+    def __init__(self, directory, policy_path):
+        self.directory = directory
+        self.key = file_hash(policy_path)
+
+    def path(self, name):
+        return os.path.join(self.directory, "%s-%s.cache" % (self.key, name))
+
+    def __prune(self):
+        if not is_private(self.directory):
+            return
+        try:
+            for f in os.listdir(self.directory):
+                if f.endswith(".cache") and not f.startswith(self.key + "-"):
+                    os.remove(os.path.join(self.directory, f))
+        except OSError:
+            pass
+
+    def get(self, name, compute):
+        computed = []
+
+        def compute_result():
+            computed.append(True)
+            return compute()
+        value = ResultFile(self.path(name), self.key).get(compute_result)
+        if computed:
+            self.__prune()
+        return value
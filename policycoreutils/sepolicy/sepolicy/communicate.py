@@ -36,7 +36,7 @@ def usage(parser, msg):
 
 def expand_attribute(attribute):
     try:
-        return info(sepolicy.ATTRIBUTE, attribute)[0]["types"]
+        return sepolicy.get_types_from_attribute(attribute)
     except RuntimeError:
         return [attribute]
 
@@ -0,0 +1,324 @@
+# Copyright (C) 2014 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# filecontexts indexes the file context specifications of the policy
+#
+#    This program is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU General Public License as
+#    published by the Free Software Foundation; either version 2 of
+#    the License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+#                                        02111-1307  USA
+#
+#
+import os
+import re
+
+trans_file_type_str = {}
+trans_file_type_str[""] = "a"
+trans_file_type_str["--"] = "f"
+trans_file_type_str["-d"] = "d"
+trans_file_type_str["-c"] = "c"
+trans_file_type_str["-b"] = "b"
+trans_file_type_str["-s"] = "s"
+trans_file_type_str["-l"] = "l"
+trans_file_type_str["-p"] = "p"
+
+# The characters which make a specification a regular expression for
+# libselinux; an escaped character is a literal.
+REGEX_CHARS = ".^$?*+|[({"
+QUANTIFIERS = "?*+{"
+
+
+def read_specs(paths):
+    """
+    Read the specifications from file_contexts files, in order, as
+    (regex, file type, type) tuples. The type is None for <<none>>.
+    Lines which are not specifications are skipped.
+    """
+    specs = []
+    for path in paths:
+        fd = open(path, "r")
+        try:
+            for line in fd:
+                rec = line.split()
+                if len(rec) < 2 or rec[0].startswith("#"):
+                    continue
+                if len(rec) > 2:
+                    ftype = trans_file_type_str.get(rec[1])
+                    if ftype is None:
+                        continue
+                else:
+                    ftype = "a"
+                if rec[-1] == "<<none>>":
+                    setype = None
+                else:
+                    context = rec[-1].split(":")
+                    if len(context) < 3:
+                        continue
+                    setype = context[2]
+                specs.append((rec[0], ftype, setype))
+        finally:
+            fd.close()
+    return specs
+
+
+def has_regex_chars(regex):
+    i = 0
+    while i < len(regex):
+        c = regex[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c in REGEX_CHARS:
+            return True
+        i += 1
+    return False
+
+
+def get_stem(regex):
+    """
+    Return the longest directory that every path matched by regex is
+    in, e.g., /usr/lib for /usr/lib/(python|perl)[^/]*/site, or "" if
+    the regex could match anywhere.
+    """
+    literal = []
+    depth = 0
+    stopped = False
+    i = 0
+    while i < len(regex):
+        c = regex[i]
+        if c == "\\":
+            if i + 1 < len(regex) and not regex[i + 1].isalnum():
+                if not stopped:
+                    literal.append(regex[i + 1])
+            else:
+                stopped = True
+            i += 2
+            continue
+        if c == "[":
+            # Skip the class, in which ( ) and | are not special.
+            start = i + 1
+            if regex[start:start + 1] == "^":
+                start += 1
+            # A ] right after the [ or [^ is part of the class.
+            end = regex.find("]", start + 1)
+            if end < 0:
+                return ""
+            stopped = True
+            i = end + 1
+            continue
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            # The alternatives need not share a prefix.
+            return ""
+        if not stopped and c in REGEX_CHARS:
+            if c in QUANTIFIERS and literal:
+                # The quantifier applies to the last literal character.
+                literal.pop()
+            stopped = True
+        elif not stopped:
+            literal.append(c)
+        i += 1
+    literal = "".join(literal)
+    return literal[:literal.rfind("/") + 1].rstrip("/")
+
+
+class FileContexts:
+
+    """
+    The file context specifications, with the specifications of each
+    type and an index of the specifications by stem - the directory
+    that all of the paths they match are in - so that looking up the
+    specification for a path only tries the regexes of its parent
+    directories. The regexes are compiled the first time they are
+    tried and kept.
+
+    Like libselinux, the last specification that matches a path is
+    used, where specifications without regular expressions come after
+    the ones with them.
+    """
+
+    def __init__(self, specs):
+        self.specs = specs
+        self.compiled = [None] * len(specs)
+        self.types = {}
+        self.stems = {}
+        self.priority = []
+        for i in range(len(specs)):
+            regex, ftype, setype = specs[i]
+            if setype is not None:
+                if setype in self.types:
+                    self.types[setype].append(i)
+                else:
+                    self.types[setype] = [i]
+            stem = get_stem(regex)
+            if stem in self.stems:
+                self.stems[stem].append(i)
+            else:
+                self.stems[stem] = [i]
+            self.priority.append((not has_regex_chars(regex), i))
+
+    def get_types(self):
+        return self.types.keys()
+
+    def get_specs(self, setype):
+        return [self.specs[i] for i in self.types.get(setype, [])]
+
+    def get_regexes(self, setype):
+        return [self.specs[i][0] for i in self.types.get(setype, [])]
+
+    def __compile(self, i):
+        r = self.compiled[i]
+        if r is None:
+            try:
+                r = re.compile("^%s$" % self.specs[i][0])
+            except re.error:
+                r = False
+            self.compiled[i] = r
+        return r
+
+    def __candidates(self, path):
+        candidates = []
+        d = path
+        while True:
+            d = d[:d.rfind("/")]
+            candidates += self.stems.get(d, [])
+            if not d:
+                break
+        return candidates
+
+    def match(self, path, ftype=None):
+        """
+        Return the specification (regex, file type, type) that labels
+        path, which is a file of type ftype ("f", "d", ...) if given,
+        or None if there is none. The type is None for <<none>>.
+        """
+        if not path.startswith("/"):
+            return None
+        path = path.rstrip("/") or "/"
+        candidates = self.__candidates(path)
+        candidates.sort(key=lambda i: self.priority[i], reverse=True)
+        for i in candidates:
+            spec = self.specs[i]
+            if ftype is not None and spec[1] != "a" and spec[1] != ftype:
+                continue
+            r = self.__compile(i)
+            if r and r.match(path):
+                return spec
+        return None
+
+
+def get_search_directory(regex):
+    # The directory whose entries find_files matches regex against.
+    p = regex
+    if p.endswith("(/.*)?"):
+        p = p[:-6] + "/"
+    path = os.path.dirname(p)
+    if path and path[-1] != "/":
+        path += "/"
+    return path
+
+
+# Group references only mean the same thing in the regex they were
+# written for.
+backref_re = re.compile(r"\\[1-9]|\(\?P=")
+
+
+def combine_regexes(regexes):
+    """
+    Return one compiled regex that matches whatever one of regexes
+    matches, or None if they cannot be combined.
+    """
+    try:
+        return re.compile("|".join(["(?:%s)$" % regex for regex in regexes]))
+    except (re.error, AssertionError):
+        # e.g. a group name used twice, or more groups than python 2
+        # supports (an AssertionError there)
+        return None
+
+
+def list_directory(path):
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
+
+
+def find_files(regexes, threads=1):
+    """
+    Return the existing files for each of the regexes, as a dictionary
+    of regex to paths. A regex which is the path of a file gives that
+    file, any other regex the entries of its directory that it matches.
+    Each directory is listed once, however many of the regexes are in
+    it, and each entry is first matched against a single alternation of
+    all of them, so only the entries which match any are matched against
+    the regexes one by one. If threads is more than 1, that many
+    directories are listed at once.
+    """
+    found = {}
+    pending = {}
+    for regex in regexes:
+        if regex in found:
+            continue
+        if os.path.exists(regex):
+            found[regex] = [regex]
+            continue
+        found[regex] = []
+        try:
+            pat = re.compile(r"%s$" % regex)
+        except re.error:
+            continue
+        path = get_search_directory(regex)
+        if not path:
+            continue
+        if path in pending:
+            pending[path].append((regex, pat))
+        else:
+            pending[path] = [(regex, pat)]
+
+    directories = list(pending)
+    if threads > 1 and len(directories) > 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(threads, len(directories)))
+        try:
+            listings = pool.map(list_directory, directories)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        listings = map(list_directory, directories)
+
+    for path, entries in zip(directories, listings):
+        pats = pending[path]
+        combined = None
+        others = []
+        plain = [x for x in pats if not backref_re.search(x[0])]
+        if len(plain) > 1:
+            combined = combine_regexes([regex for regex, pat in plain])
+            if combined is not None:
+                others = [x for x in pats if backref_re.search(x[0])]
+                pats = plain
+        for entry in entries:
+            f = path + entry
+            # An entry may match several of the regexes, so the ones it
+            # matches are found one by one.
+            if combined is None or combined.match(f):
+                for regex, pat in pats:
+                    if pat.match(f):
+                        found[regex].append(f)
+            for regex, pat in others:
+                if pat.match(f):
+                    found[regex].append(f)
+    return found
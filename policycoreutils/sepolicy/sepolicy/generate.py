@@ -94,14 +94,8 @@ def get_rpm_nvr_list(package):
 
 
 def get_all_ports():
-    dict = {}
-    for p in sepolicy.info(sepolicy.PORT):
-        if p['type'] == "reserved_port_t" or \
-                p['type'] == "port_t" or \
-                p['type'] == "hi_reserved_port_t":
-            continue
-        dict[(p['low'], p['high'], p['protocol'])] = (p['type'], p['range'])
-    return dict
+    recs = filter(lambda x: x[3] not in ["reserved_port_t", "port_t", "hi_reserved_port_t"], sepolicy.get_port_records())
+    return sepolicy.ports.PortIndex(recs)
 
 
 def get_all_users():
@@ -193,7 +187,7 @@ class policy:
 
     def __init__(self, name, type):
         self.rpms = []
-        self.ports = []
+        self.ports = sepolicy.ports.PortIndex([])
         self.all_roles = get_all_roles()
         self.types = []
 
@@ -424,10 +418,10 @@ class policy:
         return self.use_tcp() or self.use_udp()
 
     def find_port(self, port, protocol="tcp"):
-        for begin, end, p in self.ports.keys():
-            if port >= begin and port <= end and protocol == p:
-                return self.ports[begin, end, protocol]
-        return None
+        rec = self.ports.lookup(port, protocol)
+        if rec is None:
+            return None
+        return rec[3:]
 
     def set_program(self, program):
         if self.type not in APPLICATIONS:
@@ -494,29 +494,40 @@ class SELinuxGui():
             domains = sepolicy_domains
             loading_gui.show()
         length = len(domains)
-        for domain in domains:
-            # After the user selects a path in the drop down menu call
-            # get_init_entrypoint_target(entrypoint) to get the transtype
-            # which will give you the application
-            self.combo_box_initialize(domain, None)
-            self.advanced_search_initialize(domain)
-            self.all_list.append(domain)
-            self.percentage = float(float(self.loading) / float(length))
-            self.progress_bar.set_fraction(self.percentage)
-            self.progress_bar.set_pulse_step(self.percentage)
+        # The entrypoint paths are found for a chunk of the domains at a
+        # time, so the progress bar keeps moving while they are found.
+        chunk = 50
+        for start in range(0, length, chunk):
+            entrypoints = {}
+            for domain in domains[start:start + chunk]:
+                entrypoint = sepolicy.get_init_entrypoint(domain)
+                if entrypoint:
+                    entrypoints[domain] = entrypoint
+            entrypoint_paths = sepolicy.find_entrypoint_paths(entrypoints.values(), threads=4)
             self.idle_func()
+            for domain in domains[start:start + chunk]:
+                # After the user selects a path in the drop down menu call
+                # get_init_entrypoint_target(entrypoint) to get the transtype
+                # which will give you the application
+                self.combo_box_initialize(domain, None)
+                self.advanced_search_initialize(domain)
+                self.all_list.append(domain)
+                self.percentage = float(float(self.loading) / float(length))
+                self.progress_bar.set_fraction(self.percentage)
+                self.progress_bar.set_pulse_step(self.percentage)
+                self.idle_func()
 
-            entrypoint = sepolicy.get_init_entrypoint(domain)
-            if entrypoint:
-                path = sepolicy.find_entrypoint_path(entrypoint)
-                if path:
-                    self.combo_box_initialize(path, None)
-                    # Adds all files entrypoint paths that exists on disc
-                    # into the combobox
-                    self.advanced_search_initialize(path)
-                    self.installed_list.append(path)
-
-            self.loading += 1
+                entrypoint = entrypoints.get(domain)
+                if entrypoint:
+                    path = entrypoint_paths.get(entrypoint)
+                    if path:
+                        self.combo_box_initialize(path, None)
+                        # Adds all files entrypoint paths that exists on disc
+                        # into the combobox
+                        self.advanced_search_initialize(path)
+                        self.installed_list.append(path)
+
+                self.loading += 1
         loading_gui.hide()
 
         dic = {
@@ -97,7 +97,7 @@ all_entrypoints = None
 def get_entrypoints():
     global all_entrypoints
     if not all_entrypoints:
-        all_entrypoints = sepolicy.info(sepolicy.ATTRIBUTE, "entry_type")[0]["types"]
+        all_entrypoints = sepolicy.get_types_from_attribute("entry_type")
     return all_entrypoints
 
 domains = None
@@ -35,35 +35,101 @@ def get_types(src, tclass, perm):
     return nlist
 
 
+def _get_port_types(tlist, protocol, index):
+    # The (type, ports) descriptions of the port types in tlist.
+    port_types = []
+    for i in tlist:
+        if i == "ephemeral_port_type":
+            if "unreserved_port_type" in tlist:
+                continue
+            i = "ephemeral_port_t"
+        if i == "unreserved_port_t":
+            if "unreserved_port_type" in tlist:
+                continue
+            if "port_t" in tlist:
+                continue
+        if i == "port_t":
+            port_types.append((i, ["all ports with out defined types"]))
+        if i == "port_type":
+            port_types.append((i, ["all ports"]))
+        elif i == "unreserved_port_type":
+            port_types.append((i, ["all ports > 1024"]))
+        elif i == "reserved_port_type":
+            port_types.append((i, ["all ports < 1024"]))
+        elif i == "rpc_port_type":
+            port_types.append((i, ["all ports > 500 and  < 1024"]))
+        else:
+            recs = index.get_port_strings(i, protocol)
+            if recs:
+                port_types.append((i, recs))
+    return port_types
+
+
 def get_network_connect(src, protocol, perm):
-    portrecs, portrecsbynum = sepolicy.gen_port_dict()
     d = {}
     tlist = get_types(src, "%s_socket" % protocol, [perm])
     if len(tlist) > 0:
-        d[(src, protocol, perm)] = []
-        for i in tlist:
-            if i == "ephemeral_port_type":
-                if "unreserved_port_type" in tlist:
-                    continue
-                i = "ephemeral_port_t"
-            if i == "unreserved_port_t":
-                if "unreserved_port_type" in tlist:
+        d[(src, protocol, perm)] = _get_port_types(tlist, protocol, sepolicy.get_port_index())
+    return d
+
+
+PROTOCOLS = ["tcp", "udp"]
+NETWORK_PERMS = ["name_bind", "name_connect"]
+
+
+def get_network_matrix(domains=None):
+    """
+    Generate (domain, protocol, permission, port type, ports, booleans)
+    for the name_bind and name_connect access of each of the domains -
+    by default all of the domains - to tcp and udp ports, as
+    get_network_connect describes it. The socket rules of each protocol
+    are read with one search rather than one per domain. booleans are
+    the booleans allowing the access, empty if it is always allowed.
+    """
+    if domains is None:
+        domains = sorted(sepolicy.get_all_domains())
+    wanted = set(domains)
+    attribute_types = sepolicy.get_attribute_index()[0]
+    index = sepolicy.get_port_index()
+
+    # (domain, protocol, perm) -> port types in rule order, and
+    # (domain, protocol, perm, port type) -> booleans or None if a rule
+    # allows the access unconditionally
+    targets = {}
+    booleans = {}
+    for protocol in PROTOCOLS:
+        allows = search([sepolicy.ALLOW], {sepolicy.CLASS: "%s_socket" % protocol}) or []
+        for rule in allows:
+            perms = filter(lambda x: x in rule[sepolicy.PERMS], NETWORK_PERMS)
+            if not perms:
+                continue
+            source = rule[sepolicy.SOURCE]
+            target = rule[sepolicy.TARGET]
+            for d in [source] + attribute_types.get(source, []):
+                if d not in wanted:
                     continue
-                if "port_t" in tlist:
+                for perm in perms:
+                    key = (d, protocol, perm)
+                    if key not in targets:
+                        targets[key] = []
+                    if target not in targets[key]:
+                        targets[key].append(target)
+                        booleans[key + (target,)] = set()
+                    bools = booleans[key + (target,)]
+                    if "boolean" not in rule:
+                        booleans[key + (target,)] = None
+                    elif bools is not None and rule["boolean"]:
+                        bools.add("%s=%d" % rule["boolean"][0])
+
+    for d in domains:
+        for protocol in PROTOCOLS:
+            for perm in NETWORK_PERMS:
+                tlist = targets.get((d, protocol, perm))
+                if not tlist:
                     continue
-            if i == "port_t":
-                d[(src, protocol, perm)].append((i, ["all ports with out defined types"]))
-            if i == "port_type":
-                d[(src, protocol, perm)].append((i, ["all ports"]))
-            elif i == "unreserved_port_type":
-                d[(src, protocol, perm)].append((i, ["all ports > 1024"]))
-            elif i == "reserved_port_type":
-                d[(src, protocol, perm)].append((i, ["all ports < 1024"]))
-            elif i == "rpc_port_type":
-                d[(src, protocol, perm)].append((i, ["all ports > 500 and  < 1024"]))
-            else:
-                try:
-                    d[(src, protocol, perm)].append((i, portrecs[(i, protocol)]))
-                except KeyError:
-                    pass
-    return d
+                for t, recs in _get_port_types(tlist, protocol, index):
+                    if t == "ephemeral_port_t" and t not in tlist:
+                        bools = booleans[(d, protocol, perm, "ephemeral_port_type")]
+                    else:
+                        bools = booleans[(d, protocol, perm, t)]
+                    yield (d, protocol, perm, t, recs, sorted(bools or []))
@@ -0,0 +1,119 @@
+# Copyright (C) 2014 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# ports indexes the port contexts of the policy
+#
+#    This program is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU General Public License as
+#    published by the Free Software Foundation; either version 2 of
+#    the License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+#                                        02111-1307  USA
+#
+#
+import bisect
+
+
+def format_range(low, high):
+    if low == high:
+        return str(low)
+    return "%s-%s" % (low, high)
+
+
+class PortIndex:
+
+    """
+    Port ranges, given as (low, high, protocol, type, mls range) records,
+    indexed to find the ranges containing a port and the ranges of a
+    type. The end points of the ranges of each protocol split the ports
+    into segments that no range starts or ends inside, and each segment
+    keeps the ranges covering it, narrowest first. A lookup bisects to
+    the segment of the port, so it does not depend on how many ranges
+    there are or how wide they are.
+    """
+
+    def __init__(self, records):
+        self.ranges = {}
+        self.types = {}
+        for rec in sorted(records):
+            low, high, protocol, setype = rec[:4]
+            self.ranges.setdefault(protocol, []).append(rec)
+            if (setype, protocol) in self.types:
+                self.types[(setype, protocol)].append(rec)
+            else:
+                self.types[(setype, protocol)] = [rec]
+        # protocol -> first port of each segment, and the ranges
+        # covering each segment
+        self.starts = {}
+        self.segments = {}
+        for protocol, ranges in self.ranges.items():
+            points = set()
+            for r in ranges:
+                points.add(r[0])
+                points.add(r[1] + 1)
+            starts = sorted(points)
+            segments = []
+            active = []
+            n = 0
+            for start in starts:
+                # The ranges are sorted by their low port.
+                while n < len(ranges) and ranges[n][0] <= start:
+                    active.append(ranges[n])
+                    n += 1
+                active = [r for r in active if r[1] >= start]
+                segments.append(sorted(active, key=lambda r: (r[1] - r[0], r[0])))
+            self.starts[protocol] = starts
+            self.segments[protocol] = segments
+
+    def get_protocols(self):
+        return self.ranges.keys()
+
+    def get_types(self):
+        types = set()
+        for setype, protocol in self.types:
+            types.add(setype)
+        return sorted(types)
+
+    def lookup_all(self, port, protocol):
+        """
+        Return the records of all of the ranges of protocol containing
+        port, narrowest first.
+        """
+        starts = self.starts.get(protocol)
+        if not starts:
+            return []
+        i = bisect.bisect_right(starts, port) - 1
+        if i < 0:
+            return []
+        return list(self.segments[protocol][i])
+
+    def lookup(self, port, protocol):
+        """
+        Return the record of the narrowest range of protocol containing
+        port - the most specific port context for it - or None.
+        """
+        found = self.lookup_all(port, protocol)
+        if found:
+            return found[0]
+        return None
+
+    def get_type(self, port, protocol):
+        rec = self.lookup(port, protocol)
+        if rec is None:
+            return None
+        return rec[3]
+
+    def get_ranges(self, setype, protocol):
+        """Return the records of the ranges of setype for protocol."""
+        return self.types.get((setype, protocol), [])
+
+    def get_port_strings(self, setype, protocol):
+        return [format_range(r[0], r[1]) for r in self.get_ranges(setype, protocol)]
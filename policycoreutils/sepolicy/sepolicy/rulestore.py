@@ -0,0 +1,128 @@
+# Copyright (C) 2014 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# rulestore indexes the rules of the loaded policy for sepolicy.search
+#
+#    This program is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU General Public License as
+#    published by the Free Software Foundation; either version 2 of
+#    the License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA
+#                                        02111-1307  USA
+#
+#
+import _policy
+
+SOURCE = 'source'
+TARGET = 'target'
+CLASS = 'class'
+PERMS = 'permlist'
+ROLE_ALLOW = 'role_allow'
+
+FIELDS = [SOURCE, TARGET, CLASS, PERMS]
+
+
+class RuleStore:
+
+    """
+    All of the rules of one kind (allow, transition, ...) are read from
+    the policy with a single query the first time they are searched and
+    indexed by source, target, class and permission. Searches are then
+    answered by intersecting the indexes.
+
+    Like the policy search, a type also matches the rules written for
+    its attributes and an attribute the rules written for its types -
+    attribute_types and type_attributes map the attributes to their
+    types and back (see sepolicy.get_attribute_index).
+
+    The rule dictionaries are shared by all of the searches and must not
+    be modified.
+    """
+
+    def __init__(self, attribute_types, type_attributes):
+        self.rules = {}
+        self.index = {}
+        self.attribute_types = attribute_types
+        self.type_attributes = type_attributes
+
+    def __load(self, kind):
+        rules = _policy.search({kind: True}) or []
+        for field in FIELDS:
+            idx = {}
+            for i in range(len(rules)):
+                r = rules[i]
+                if field not in r:
+                    continue
+                if field == PERMS:
+                    values = r[PERMS]
+                else:
+                    values = [r[field]]
+                for v in values:
+                    if v in idx:
+                        idx[v].append(i)
+                    else:
+                        idx[v] = [i]
+            self.index[(kind, field)] = idx
+        self.rules[kind] = rules
+        return rules
+
+    def expand(self, name):
+        names = set([name])
+        names.update(self.attribute_types.get(name, []))
+        names.update(self.type_attributes.get(name, []))
+        return names
+
+    def __match(self, kind, field, names):
+        idx = self.index[(kind, field)]
+        matches = set()
+        for n in names:
+            matches.update(idx.get(n, []))
+        return matches
+
+    def search(self, kind, seinfo):
+        rules = self.rules.get(kind)
+        if rules is None:
+            rules = self.__load(kind)
+
+        matches = None
+        for field in [SOURCE, TARGET, CLASS]:
+            name = seinfo.get(field)
+            if not name:
+                continue
+            if field == CLASS:
+                if kind == ROLE_ALLOW:
+                    continue
+                names = [name]
+            elif kind == ROLE_ALLOW:
+                names = [name]
+            else:
+                names = self.expand(name)
+            m = self.__match(kind, field, names)
+            if matches is None:
+                matches = m
+            else:
+                matches &= m
+            if not matches:
+                return []
+
+        # Rules must have all of the permissions.
+        for perm in seinfo.get(PERMS, []):
+            m = self.__match(kind, PERMS, [perm])
+            if matches is None:
+                matches = m
+            else:
+                matches &= m
+            if not matches:
+                return []
+
+        if matches is None:
+            return list(rules)
+        return [rules[i] for i in sorted(matches)]
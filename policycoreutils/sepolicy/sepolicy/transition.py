@@ -23,7 +23,7 @@
 import sepolicy
 search = sepolicy.search
 info = sepolicy.info
-__all__ = ['setrans', ]
+__all__ = ['setrans', 'TransitionGraph', 'get_transition_graph']
 
 
 def _entrypoint(src):
@@ -35,50 +35,243 @@ def _get_trans(src):
     return search([sepolicy.TRANSITION], {sepolicy.SOURCE: src, sepolicy.CLASS: "process"})
 
 
+def _index_by_source(rules):
+    index = {}
+    for i in range(len(rules)):
+        source = rules[i][sepolicy.SOURCE]
+        if source in index:
+            index[source].append(i)
+        else:
+            index[source] = [i]
+    return index
+
+
+class TransitionGraph:
+
+    """
+    The process transitions of the policy as a graph of domains. The
+    process type_transition rules and the allow rules for the process
+    transition permission are each read with a single search. Domains
+    are numbered the first time they are visited, and the transitions
+    out of a domain are kept as the list of the numbers of the domains
+    they lead to. The domains reachable from a domain are computed once
+    and kept as a bitset of those numbers.
+
+    As with search, the rules of a domain include the rules written for
+    its attributes.
+    """
+
+    def __init__(self):
+        self.attribute_types, self.type_attributes = sepolicy.get_attribute_index()
+        self.rules = search([sepolicy.TRANSITION], {sepolicy.CLASS: "process"}) or []
+        self.rules_by_source = _index_by_source(self.rules)
+        self.allows = search([sepolicy.ALLOW], {sepolicy.CLASS: "process", sepolicy.PERMS: ["transition"]}) or []
+        self.allows_by_source = _index_by_source(self.allows)
+        self.names = []
+        self.ids = {}
+        self.transitions = []
+        self.adjacency = []
+        self.reach = []
+        self.conditionals = {}
+
+    def __expand(self, name):
+        return [name] + self.attribute_types.get(name, []) + self.type_attributes.get(name, [])
+
+    def __rules(self, index, name):
+        indices = set()
+        for n in self.__expand(name):
+            indices.update(index.get(n, []))
+        return sorted(indices)
+
+    def __id(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = len(self.names)
+            self.ids[name] = i
+            self.names.append(name)
+            self.transitions.append(None)
+            self.adjacency.append(None)
+            self.reach.append(None)
+        return i
+
+    def __transitions(self, i):
+        trans = self.transitions[i]
+        if trans is None:
+            trans = [self.rules[r] for r in self.__rules(self.rules_by_source, self.names[i])]
+            self.transitions[i] = trans
+        return trans
+
+    def __successors(self, i):
+        adjacency = self.adjacency[i]
+        if adjacency is None:
+            adjacency = []
+            for t in self.__transitions(i):
+                j = self.__id(t["transtype"])
+                if j not in adjacency:
+                    adjacency.append(j)
+            self.adjacency[i] = adjacency
+        return adjacency
+
+    def __reach(self, i):
+        bits = self.reach[i]
+        if bits is not None:
+            return bits
+        bits = 0
+        queue = list(self.__successors(i))
+        while queue:
+            j = queue.pop()
+            if bits >> j & 1:
+                continue
+            bits |= 1 << j
+            if self.reach[j] is not None:
+                # Everything reachable from j is already known.
+                bits |= self.reach[j]
+                continue
+            queue.extend(self.__successors(j))
+        self.reach[i] = bits
+        return bits
+
+    def get_transitions(self, domain):
+        """Return the process type_transition rules of domain."""
+        return self.__transitions(self.__id(domain))
+
+    def all_transitions(self, domains=None):
+        """
+        Return the transitions of each of the domains - by default all
+        of the domains of the policy - as a dictionary of domain to
+        type_transition rules.
+        """
+        if domains is None:
+            domains = sepolicy.get_all_domains()
+        trans = {}
+        for d in domains:
+            trans[d] = self.get_transitions(d)
+        return trans
+
+    def reachable(self, source):
+        """Return the domains source can transition to, directly or not."""
+        bits = self.__reach(self.__id(source))
+        return [self.names[j] for j in range(len(self.names)) if bits >> j & 1]
+
+    def can_transition(self, source, dest):
+        return bool(self.__reach(self.__id(source)) >> self.__id(dest) & 1)
+
+    def shortest_path(self, source, dest):
+        """
+        Return a shortest list of domains from source to dest, each of
+        which can transition to the next, or None if there is none.
+        """
+        start = self.__id(source)
+        end = self.__id(dest)
+        if not self.__reach(start) >> end & 1:
+            return None
+        parent = {start: None}
+        queue = [start]
+        for i in queue:
+            for j in self.__successors(i):
+                if j == end:
+                    # Checked first so that a path back to source
+                    # through a cycle is found too.
+                    path = [dest]
+                    while i is not None:
+                        path.append(self.names[i])
+                        i = parent[i]
+                    path.reverse()
+                    return path
+                if j in parent:
+                    continue
+                parent[j] = i
+                queue.append(j)
+        return None
+
+    def all_paths(self, source, dest):
+        """
+        Return all of the lists of domains from source to dest, each of
+        which can transition to the next, that do not visit a domain
+        twice. Only the domains dest is reachable from are followed.
+        """
+        end = self.__id(dest)
+        paths = []
+        path = [self.__id(source)]
+        on_path = set(path)
+
+        def walk(i):
+            for j in self.__successors(i):
+                if j == end:
+                    paths.append([self.names[x] for x in path] + [dest])
+                elif j not in on_path and self.__reach(j) >> end & 1:
+                    path.append(j)
+                    on_path.add(j)
+                    walk(j)
+                    on_path.remove(j)
+                    path.pop()
+        walk(path[0])
+        return paths
+
+    def get_conditionals(self, src, dest):
+        """
+        Return the booleans of the rules allowing src to transition to
+        dest, like sepolicy.get_conditionals(src, dest, "process",
+        ["transition"]). Empty if the transition is not conditional.
+        """
+        key = (src, dest)
+        if key in self.conditionals:
+            return self.conditionals[key]
+        targets = set(self.__expand(dest))
+        tlist = []
+        for r in self.__rules(self.allows_by_source, src):
+            a = self.allows[r]
+            if a[sepolicy.TARGET] not in targets:
+                continue
+            if "boolean" not in a:
+                # An unconditional rule allows the transition.
+                tlist = []
+                break
+            if a["boolean"]:
+                tdict = {'source': a['source'], 'boolean': a['boolean']}
+                if tdict not in tlist:
+                    tlist.append(tdict)
+        self.conditionals[key] = tlist
+        return tlist
+
+
+def get_transition_graph():
+    return sepolicy.cache.get("transition_graph", TransitionGraph, sepolicy.policy_key())
+
+
 class setrans:
 
     def __init__(self, source, dest=None):
-        self.seen = []
-        self.sdict = {}
+        self.seen = set()
+        self.graph = get_transition_graph()
         self.source = source
         self.dest = dest
-        self._process(self.source)
-
-    def _process(self, source):
-        if source in self.sdict:
-            return self.sdict[source]
-        self.sdict[source] = {}
-        trans = _get_trans(source)
-        if not trans:
-            return
-        self.sdict[source]["name"] = source
-        if not self.dest:
-            self.sdict[source]["map"] = trans
-        else:
-            self.sdict[source]["map"] = map(lambda y: y, filter(lambda x: x["transtype"] == self.dest, trans))
-            self.sdict[source]["child"] = map(lambda y: y["transtype"], filter(lambda x: x["transtype"] not in [self.dest, source], trans))
-            for s in self.sdict[source]["child"]:
-                self._process(s)
 
     def out(self, name, header=""):
         buf = ""
         if name in self.seen:
             return buf
-        self.seen.append(name)
-
-        if "map" in self.sdict[name]:
-            for t in self.sdict[name]["map"]:
-                cond = sepolicy.get_conditionals(t["source"], t["transtype"], "process", ["transition"])
-                if cond:
-                    buf += "%s%s @ %s --> %s %s\n" % (header, t["source"], t["target"], t["transtype"], sepolicy.get_conditionals_format_text(cond))
-                else:
-                    buf += "%s%s @ %s --> %s\n" % (header, t["source"], t["target"], t["transtype"])
-
-        if "child" in self.sdict[name]:
-            for x in self.sdict[name]["child"]:
-                buf += self.out(x, "%s%s ... " % (header, name))
+        self.seen.add(name)
+
+        trans = self.graph.get_transitions(name)
+        if self.dest:
+            trans_map = filter(lambda x: x["transtype"] == self.dest, trans)
+        else:
+            trans_map = trans
+        for t in trans_map:
+            cond = self.graph.get_conditionals(t["source"], t["transtype"])
+            if cond:
+                buf += "%s%s @ %s --> %s %s\n" % (header, t["source"], t["target"], t["transtype"], sepolicy.get_conditionals_format_text(cond))
+            else:
+                buf += "%s%s @ %s --> %s\n" % (header, t["source"], t["target"], t["transtype"])
+
+        if self.dest:
+            # Domains which cannot reach dest would not add anything.
+            for x in map(lambda y: y["transtype"], filter(lambda x: x["transtype"] not in [self.dest, name], trans)):
+                if self.graph.can_transition(x, self.dest):
+                    buf += self.out(x, "%s%s ... " % (header, name))
         return buf
 
     def output(self):
-        self.seen = []
+        self.seen = set()
         print self.out(self.source)
@@ -1,9 +1,115 @@
 import unittest
+import csv
+import json
 import os
 import shutil
+import sys
+import types
 from tempfile import mkdtemp
 from subprocess import Popen, PIPE
 
+# The modules which index the policy are tested directly from the
+# source tree, on small policies made up by the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "sepolicy"))
+import caching
+import filecontexts
+import ports
+
+# A made up policy. The fake _policy.search answers queries the way the
+# policy search did before the rule store: a type also matches the
+# rules of its attributes and an attribute the rules of its types, and
+# a rule matches if it has any of the permissions.
+ATTRIBUTE_TYPES = {
+    "domain": ["httpd_t", "sshd_t", "init_t", "script_t", "sendmail_t", "shell_t", "passwd_t"],
+    "file_type": ["etc_t", "shadow_t", "bin_t"],
+    "login_domain": ["shell_t"],
+}
+TYPE_ATTRIBUTES = {}
+for a, ts in ATTRIBUTE_TYPES.items():
+    for t in ts:
+        TYPE_ATTRIBUTES.setdefault(t, []).append(a)
+
+RULES = [
+    ("allow", {"source": "httpd_t", "target": "etc_t", "class": "file", "permlist": ["read", "getattr", "open"]}),
+    ("allow", {"source": "domain", "target": "file_type", "class": "file", "permlist": ["getattr"]}),
+    ("allow", {"source": "domain", "target": "etc_t", "class": "dir", "permlist": ["search"]}),
+    ("allow", {"source": "sshd_t", "target": "shadow_t", "class": "file", "permlist": ["read"]}),
+    ("allow", {"source": "httpd_t", "target": "httpd_t", "class": "process", "permlist": ["fork", "signal"]}),
+    ("allow", {"source": "domain", "target": "domain", "class": "process", "permlist": ["sigchld"]}),
+    ("allow", {"source": "init_t", "target": "bin_t", "class": "file", "permlist": ["execute", "read", "open"]}),
+    ("allow", {"source": "init_t", "target": "httpd_t", "class": "process", "permlist": ["transition"]}),
+    ("dontaudit", {"source": "domain", "target": "shadow_t", "class": "file", "permlist": ["read"]}),
+    ("transition", {"source": "init_t", "target": "bin_t", "class": "process", "transtype": "httpd_t"}),
+    # The process transitions, with the cycles httpd_t -> script_t ->
+    # httpd_t, sshd_t -> shell_t -> sshd_t and sendmail_t -> sendmail_t.
+    ("transition", {"source": "init_t", "target": "sshd_exec_t", "class": "process", "transtype": "sshd_t"}),
+    ("transition", {"source": "httpd_t", "target": "script_exec_t", "class": "process", "transtype": "script_t"}),
+    ("transition", {"source": "script_t", "target": "httpd_exec_t", "class": "process", "transtype": "httpd_t"}),
+    ("transition", {"source": "script_t", "target": "sendmail_exec_t", "class": "process", "transtype": "sendmail_t"}),
+    ("transition", {"source": "sshd_t", "target": "shell_exec_t", "class": "process", "transtype": "shell_t"}),
+    ("transition", {"source": "shell_t", "target": "sshd_exec_t", "class": "process", "transtype": "sshd_t"}),
+    ("transition", {"source": "shell_t", "target": "sendmail_exec_t", "class": "process", "transtype": "sendmail_t"}),
+    ("transition", {"source": "login_domain", "target": "passwd_exec_t", "class": "process", "transtype": "passwd_t"}),
+    ("transition", {"source": "sendmail_t", "target": "sendmail_exec_t", "class": "process", "transtype": "sendmail_t"}),
+    ("allow", {"source": "httpd_t", "target": "script_t", "class": "process", "permlist": ["transition"],
+               "boolean": [("httpd_enable_cgi", 1)]}),
+    ("allow", {"source": "shell_t", "target": "sendmail_t", "class": "process", "permlist": ["transition"],
+               "boolean": [("allow_mail", 0)]}),
+    ("allow", {"source": "login_domain", "target": "sendmail_t", "class": "process", "permlist": ["transition"]}),
+]
+
+
+def fake_policy_search(seinfo):
+    def matches(rule_name, name):
+        return (rule_name == name or
+                rule_name in TYPE_ATTRIBUTES.get(name, []) or
+                rule_name in ATTRIBUTE_TYPES.get(name, []))
+    perms = []
+    if seinfo.get("permlist"):
+        perms = seinfo["permlist"].split(",")
+    found = []
+    for kind, rule in RULES:
+        if not seinfo.get(kind):
+            continue
+        if seinfo.get("source") and not matches(rule["source"], seinfo["source"]):
+            continue
+        if seinfo.get("target") and not matches(rule["target"], seinfo["target"]):
+            continue
+        if seinfo.get("class") and rule["class"] != seinfo["class"]:
+            continue
+        if perms and not set(perms) & set(rule.get("permlist", [])):
+            continue
+        found.append(rule)
+    return found
+
+_policy = types.ModuleType("_policy")
+_policy.search = fake_policy_search
+sys.modules["_policy"] = _policy
+import rulestore
+
+
+def fake_search(kinds, info={}):
+    store = rulestore.RuleStore(ATTRIBUTE_TYPES, TYPE_ATTRIBUTES)
+    found = []
+    for kind in kinds:
+        found += store.search(kind, info)
+    return found or None
+
+# transition uses the package, which would load the policy.
+_sepolicy = types.ModuleType("sepolicy")
+_sepolicy.ALLOW = "allow"
+_sepolicy.TRANSITION = "transition"
+_sepolicy.SOURCE = "source"
+_sepolicy.TARGET = "target"
+_sepolicy.CLASS = "class"
+_sepolicy.PERMS = "permlist"
+_sepolicy.search = fake_search
+_sepolicy.info = None
+_sepolicy.get_attribute_index = lambda: (ATTRIBUTE_TYPES, TYPE_ATTRIBUTES)
+_sepolicy.get_all_domains = lambda: ATTRIBUTE_TYPES["domain"]
+sys.modules["sepolicy"] = _sepolicy
+import transition
+
 
 class SepolicyTests(unittest.TestCase):
 
@@ -60,6 +166,28 @@ class SepolicyTests(unittest.TestCase):
         out, err = p.communicate()
         self.assertSuccess(p.returncode, err)
 
+    def test_network_all_domains_csv(self):
+        "Verify sepolicy network --all-domains --format csv works"
+        p = Popen(['sepolicy', 'network', '--all-domains', '--format', 'csv'], stdout=PIPE)
+        out, err = p.communicate()
+        self.assertSuccess(p.returncode, err)
+        rows = list(csv.reader(out.splitlines()))
+        self.assertEqual(rows[0], ["domain", "protocol", "permission", "type", "ports", "booleans"])
+        self.assert_(["httpd_t", "tcp", "name_bind", "http_port_t"] in [r[:4] for r in rows[1:]])
+
+    def test_network_all_domains_json(self):
+        "Verify sepolicy network --all-domains --format json works"
+        p = Popen(['sepolicy', 'network', '--all-domains', '--format', 'json'], stdout=PIPE)
+        out, err = p.communicate()
+        self.assertSuccess(p.returncode, err)
+        rows = json.loads(out)
+        self.assert_(len(rows) > 0)
+        self.assertEqual(sorted(rows[0].keys()), ["booleans", "domain", "permission", "ports", "protocol", "type"])
+        http = filter(lambda x: x["domain"] == "httpd_t" and x["protocol"] == "tcp" and
+                      x["permission"] == "name_bind" and x["type"] == "http_port_t", rows)
+        self.assertEqual(len(http), 1)
+        self.assert_("80" in http[0]["ports"])
+
     def test_transition_s(self):
         "Verify sepolicy transition -l works"
         p = Popen(['sepolicy', 'transition', '-s', 'httpd_t'], stdout=PIPE)
@@ -114,6 +242,364 @@ class SepolicyTests(unittest.TestCase):
         out, err = p.communicate()
         self.assertSuccess(p.returncode, err)
 
+
+class FileContextsTests(unittest.TestCase):
+
+    def test_has_regex_chars(self):
+        "Verify file context regex detection matches libselinux"
+        self.assertFalse(filecontexts.has_regex_chars("/usr/bin/foo"))
+        self.assertFalse(filecontexts.has_regex_chars("/usr/bin/foo\\.sh"))
+        self.assertFalse(filecontexts.has_regex_chars("/usr/bin/foo\\+\\+"))
+        self.assertTrue(filecontexts.has_regex_chars("/usr/bin/foo\\..*"))
+        self.assertTrue(filecontexts.has_regex_chars("/etc(/.*)?"))
+        self.assertTrue(filecontexts.has_regex_chars("/etc/passwd[-+]?"))
+        self.assertTrue(filecontexts.has_regex_chars("/dev/tty{1}"))
+
+    def test_get_stem(self):
+        "Verify file context stems"
+        get_stem = filecontexts.get_stem
+        self.assertEqual(get_stem("/usr/bin/foo"), "/usr/bin")
+        self.assertEqual(get_stem("/etc(/.*)?"), "")
+        self.assertEqual(get_stem("/etc/httpd(/.*)?"), "/etc")
+        # alternation
+        self.assertEqual(get_stem("/usr/lib/(python|perl)[^/]*/site"), "/usr/lib")
+        self.assertEqual(get_stem("/usr/bin/foo|/usr/sbin/foo"), "")
+        # escapes
+        self.assertEqual(get_stem("/var/lib/foo\\.d/bar"), "/var/lib/foo.d")
+        self.assertEqual(get_stem("/var/lib/foo\\d/bar"), "/var/lib")
+        # bracket classes
+        self.assertEqual(get_stem("/etc/[^/]+/conf"), "/etc")
+        self.assertEqual(get_stem("/usr/lib/[]|(]/foo"), "/usr/lib")
+        self.assertEqual(get_stem("/usr/lib/[^]/]*/foo"), "/usr/lib")
+        # quantifier after a literal
+        self.assertEqual(get_stem("/usr/lib64?/foo"), "/usr")
+        self.assertEqual(get_stem("/usr/lib/foo/?"), "/usr/lib")
+        self.assertEqual(get_stem("/usr/libexec/foo{1}/bar"), "/usr/libexec")
+
+    def test_match(self):
+        "Verify file context matching gives the matchpathcon results"
+        fc = filecontexts.FileContexts([
+            ("/etc(/.*)?", "a", "etc_t"),
+            ("/etc/passwd[-\\+]?", "f", "passwd_file_t"),
+            ("/etc/shadow.*", "f", "shadow_t"),
+            ("/usr/bin(/.*)?", "a", "bin_t"),
+            ("/usr/bin/foo\\.sh", "f", "foo_exec_t"),
+            ("/usr/bin/foo.*", "f", "foo_script_t"),
+            ("/usr/bin/httpd", "f", "httpd_exec_t"),
+            ("/usr/(s)?bin/httpd", "f", "bin_t"),
+            ("/proc(/.*)?", "a", None),
+        ])
+        def match(path, ftype=None):
+            spec = fc.match(path, ftype)
+            if spec:
+                return spec[2]
+            return spec
+        # The last matching specification wins...
+        self.assertEqual(match("/etc/hosts", "f"), "etc_t")
+        self.assertEqual(match("/etc/passwd", "f"), "passwd_file_t")
+        self.assertEqual(match("/etc/passwd-", "f"), "passwd_file_t")
+        self.assertEqual(match("/etc/shadow", "f"), "shadow_t")
+        self.assertEqual(match("/usr/bin/foo", "f"), "foo_script_t")
+        # ...of the right file type...
+        self.assertEqual(match("/etc/passwd", "d"), "etc_t")
+        self.assertEqual(match("/etc/passwd"), "passwd_file_t")
+        # ...and one without regex characters, escaped ones included,
+        # wins over the ones with them.
+        self.assertEqual(match("/usr/bin/foo.sh", "f"), "foo_exec_t")
+        self.assertEqual(match("/usr/bin/httpd", "f"), "httpd_exec_t")
+        self.assertEqual(match("/usr/sbin/httpd", "f"), "bin_t")
+        self.assertEqual(match("/proc/1", "f"), None)
+        self.assertEqual(fc.match("/proc/1", "f")[0], "/proc(/.*)?")
+        self.assertEqual(fc.match("/var/foo", "f"), None)
+        self.assertEqual(fc.match("etc/hosts", "f"), None)
+
+    def test_find_files(self):
+        "Verify find_files finds the entries each regex matches"
+        d = mkdtemp()
+        try:
+            for name in ["a", "aa", "ab", "abc", "x.conf", "y"]:
+                open(os.path.join(d, name), "w").close()
+            regexes = [d + "/a.*", d + "/ab", d + "/(a)\\1", d + "/.*\\.conf",
+                       d + "/(?P<n>y)", d + "/[", d + "/missing"]
+            found = filecontexts.find_files(regexes)
+            for regex in found:
+                found[regex] = sorted(found[regex])
+            self.assertEqual(found, {
+                d + "/a.*": [d + "/a", d + "/aa", d + "/ab", d + "/abc"],
+                d + "/ab": [d + "/ab"],
+                d + "/(a)\\1": [d + "/aa"],
+                d + "/.*\\.conf": [d + "/x.conf"],
+                d + "/(?P<n>y)": [d + "/y"],
+                d + "/[": [],
+                d + "/missing": [],
+            })
+            # Regexes which cannot be combined are matched one by one.
+            found = filecontexts.find_files([d + "/(?P<n>a)", d + "/(?P<n>y)"])
+            self.assertEqual(found, {d + "/(?P<n>a)": [d + "/a"],
+                                     d + "/(?P<n>y)": [d + "/y"]})
+        finally:
+            shutil.rmtree(d)
+
+class RuleStoreTests(unittest.TestCase):
+
+    def old_search(self, kind, info):
+        # The search before the rule store: query the policy, then keep
+        # the rules with all of the permissions.
+        seinfo = dict(info)
+        seinfo[kind] = True
+        perms = seinfo.get("permlist", [])
+        if perms:
+            seinfo["permlist"] = ",".join(perms)
+        found = fake_policy_search(seinfo)
+        if perms:
+            found = [r for r in found if set(perms).issubset(r["permlist"])]
+        return found
+
+    def test_search(self):
+        "Verify the rule store finds the rules the policy search did"
+        store = rulestore.RuleStore(ATTRIBUTE_TYPES, TYPE_ATTRIBUTES)
+        queries = [
+            ("allow", {}),
+            ("allow", {"source": "httpd_t"}),
+            ("allow", {"source": "domain"}),
+            ("allow", {"target": "etc_t"}),
+            ("allow", {"source": "httpd_t", "class": "file", "permlist": ["read"]}),
+            ("allow", {"source": "domain", "target": "etc_t"}),
+            ("allow", {"target": "shadow_t", "permlist": ["read", "getattr"]}),
+            ("allow", {"target": "bin_t", "permlist": ["read", "open"]}),
+            ("allow", {"permlist": ["getattr", "open"]}),
+            ("allow", {"source": "sshd_t", "class": "process"}),
+            ("allow", {"source": "init_t", "class": "process", "permlist": ["transition"]}),
+            ("allow", {"source": "unknown_t"}),
+            ("dontaudit", {"source": "httpd_t", "target": "file_type"}),
+            ("transition", {"source": "domain", "class": "process"}),
+        ]
+        for kind, info in queries:
+            expected = self.old_search(kind, info)
+            found = store.search(kind, info)
+            self.assertEqual(sorted(map(id, found)), sorted(map(id, expected)), "%s %s" % (kind, info))
+
+        self.assertEqual(len(store.search("allow", {"source": "httpd_t", "target": "etc_t"})), 3)
+        self.assertEqual(store.search("allow", {"target": "shadow_t", "permlist": ["read", "getattr"]}), [])
+
+class CachingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.cache_dir = os.path.join(self.dir, "cache")
+        self.policy = os.path.join(self.dir, "policy")
+        self.write_policy("policy 1")
+        self.computed = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_policy(self, data):
+        fd = open(self.policy, "w")
+        fd.write(data)
+        fd.close()
+
+    def compute(self):
+        self.computed += 1
+        return ["ports", self.computed]
+
+    def test_cache_key(self):
+        "Verify cache entries are computed again for a new key"
+        cache = caching.Cache()
+        self.assertEqual(cache.get("ports", self.compute, 1), ["ports", 1])
+        self.assertEqual(cache.get("ports", self.compute, 1), ["ports", 1])
+        self.assertEqual(cache.get("ports", self.compute, 2), ["ports", 2])
+
+        key = caching.file_key(self.policy)
+        self.assertEqual(caching.file_key(self.policy), key)
+        self.write_policy("policy 2")
+        self.assertNotEqual(caching.file_key(self.policy), key)
+
+    def test_policy_store(self):
+        "Verify saved results are only used for the same policy"
+        store = caching.PolicyStore(self.cache_dir, self.policy)
+        self.assertEqual(store.get("ports", self.compute), ["ports", 1])
+        self.assertEqual(store.get("types", self.compute), ["ports", 2])
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+        # A later process with the same policy loads the results...
+        store = caching.PolicyStore(self.cache_dir, self.policy)
+        self.assertEqual(store.get("ports", self.compute), ["ports", 1])
+        self.assertEqual(self.computed, 2)
+
+        # ...but not once the policy changes, and then the results of
+        # the old policy are removed.
+        self.write_policy("policy 2")
+        store = caching.PolicyStore(self.cache_dir, self.policy)
+        self.assertEqual(store.get("ports", self.compute), ["ports", 3])
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(store.path("ports"))])
+
+    def test_private(self):
+        "Verify saved results are only loaded from private files"
+        store = caching.PolicyStore(self.cache_dir, self.policy)
+        store.get("ports", self.compute)
+        os.chmod(store.path("ports"), 0666)
+        self.assertEqual(store.get("ports", self.compute), ["ports", 2])
+        os.chmod(self.cache_dir, 0777)
+        self.assertEqual(store.get("ports", self.compute), ["ports", 3])
+        self.assertEqual(store.get("ports", self.compute), ["ports", 4])
+
+class PortIndexTests(unittest.TestCase):
+
+    records = [
+        (1, 1023, "tcp", "reserved_port_t", "s0"),
+        (1, 1023, "udp", "reserved_port_t", "s0"),
+        (1024, 32767, "tcp", "unreserved_port_t", "s0"),
+        (1024, 32767, "udp", "unreserved_port_t", "s0"),
+        (32768, 60999, "tcp", "ephemeral_port_t", "s0"),
+        (53, 53, "tcp", "dns_port_t", "s0"),
+        (53, 53, "udp", "dns_port_t", "s0"),
+        (80, 80, "tcp", "http_port_t", "s0"),
+        (443, 443, "tcp", "http_port_t", "s0"),
+        (8080, 8080, "tcp", "http_cache_port_t", "s0"),
+        (5900, 5983, "tcp", "vnc_port_t", "s0"),
+        (5901, 5901, "tcp", "xserver_port_t", "s0"),
+        (6000, 6020, "tcp", "xserver_port_t", "s0"),
+        (60000, 61000, "udp", "mosh_port_t", "s0"),
+        (60000, 60000, "udp", "amanda_port_t", "s0"),
+    ]
+
+    def find_port(self, port, protocol):
+        # The linear search the index replaced, which returned the
+        # first of the matching ranges in no particular order - here
+        # all of them, the narrowest first.
+        found = []
+        for rec in self.records:
+            if port >= rec[0] and port <= rec[1] and protocol == rec[2]:
+                found.append(rec)
+        found.sort(key=lambda r: (r[1] - r[0], r[0]))
+        return found
+
+    def test_lookup(self):
+        "Verify port lookups give the results of the linear search"
+        index = ports.PortIndex(self.records)
+        for protocol in ["tcp", "udp"]:
+            for port in range(0, 65536):
+                found = self.find_port(port, protocol)
+                self.assertEqual(index.lookup_all(port, protocol), found)
+                if found:
+                    self.assertEqual(index.lookup(port, protocol), found[0])
+                else:
+                    self.assertEqual(index.lookup(port, protocol), None)
+
+    def test_wide_ranges(self):
+        "Verify port lookups do not walk the ranges"
+        reads = []
+
+        class Record(tuple):
+
+            def __getitem__(self, i):
+                reads.append(i)
+                return tuple.__getitem__(self, i)
+
+        # Wide ranges at the start, like reserved_port_t, and many
+        # single ports after them.
+        records = [Record((1, 511, "tcp", "reserved_port_t", "s0")),
+                   Record((1024, 32767, "tcp", "unreserved_port_t", "s0")),
+                   Record((32768, 60999, "tcp", "ephemeral_port_t", "s0"))]
+        for port in range(1100, 32000, 10):
+            records.append(Record((port, port, "tcp", "app%d_port_t" % port, "s0")))
+        index = ports.PortIndex(records)
+        del reads[:]
+        self.assertEqual(index.get_type(31995, "tcp"), "unreserved_port_t")
+        self.assertEqual(index.get_type(31990, "tcp"), "app31990_port_t")
+        self.assertEqual(len(index.lookup_all(31990, "tcp")), 2)
+        # Only the type of the records found is read.
+        self.assertEqual(len(reads), 2)
+
+    def test_specific(self):
+        "Verify the most specific port range wins"
+        index = ports.PortIndex(self.records)
+        self.assertEqual(index.get_type(80, "tcp"), "http_port_t")
+        self.assertEqual(index.get_type(81, "tcp"), "reserved_port_t")
+        self.assertEqual(index.get_type(5900, "tcp"), "vnc_port_t")
+        self.assertEqual(index.get_type(5901, "tcp"), "xserver_port_t")
+        self.assertEqual(index.get_type(6000, "tcp"), "xserver_port_t")
+        self.assertEqual(index.get_type(60000, "udp"), "amanda_port_t")
+        self.assertEqual(index.get_type(60001, "udp"), "mosh_port_t")
+        self.assertEqual([r[3] for r in index.lookup_all(5901, "tcp")],
+                         ["xserver_port_t", "vnc_port_t", "unreserved_port_t"])
+
+    def test_protocols(self):
+        "Verify port ranges are kept apart by protocol"
+        index = ports.PortIndex(self.records)
+        self.assertEqual(sorted(index.get_protocols()), ["tcp", "udp"])
+        self.assertEqual(index.get_type(80, "udp"), "reserved_port_t")
+        self.assertEqual(index.get_type(40000, "udp"), None)
+        self.assertEqual(index.get_type(60000, "tcp"), "ephemeral_port_t")
+        self.assertEqual(index.get_type(53, "sctp"), None)
+        self.assertEqual(index.get_port_strings("http_port_t", "tcp"), ["80", "443"])
+        self.assertEqual(index.get_port_strings("http_port_t", "udp"), [])
+        self.assertEqual(index.get_port_strings("xserver_port_t", "tcp"), ["5901", "6000-6020"])
+        self.assertEqual(index.get_ranges("mosh_port_t", "udp"), [(60000, 61000, "udp", "mosh_port_t", "s0")])
+
+class TransitionGraphTests(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = transition.TransitionGraph()
+
+    def test_reachable(self):
+        "Verify the domains reachable through cycles"
+        g = self.graph
+        self.assertEqual(sorted(g.reachable("init_t")),
+                         ["httpd_t", "passwd_t", "script_t", "sendmail_t", "shell_t", "sshd_t"])
+        self.assertEqual(sorted(g.reachable("httpd_t")), ["httpd_t", "script_t", "sendmail_t"])
+        self.assertEqual(sorted(g.reachable("shell_t")), ["passwd_t", "sendmail_t", "shell_t", "sshd_t"])
+        self.assertEqual(g.reachable("sendmail_t"), ["sendmail_t"])
+        self.assertEqual(g.reachable("passwd_t"), [])
+        self.assertTrue(g.can_transition("script_t", "httpd_t"))
+        self.assertTrue(g.can_transition("sshd_t", "sshd_t"))
+        self.assertTrue(g.can_transition("sshd_t", "passwd_t"))
+        self.assertFalse(g.can_transition("httpd_t", "sshd_t"))
+        self.assertFalse(g.can_transition("sendmail_t", "httpd_t"))
+        self.assertFalse(g.can_transition("passwd_t", "passwd_t"))
+        # Reachability computed for one domain is reused for another.
+        self.assertEqual(sorted(g.reachable("script_t")), ["httpd_t", "script_t", "sendmail_t"])
+
+    def test_shortest_path(self):
+        "Verify shortest transition paths"
+        g = self.graph
+        self.assertEqual(g.shortest_path("httpd_t", "sendmail_t"), ["httpd_t", "script_t", "sendmail_t"])
+        self.assertEqual(g.shortest_path("init_t", "passwd_t"), ["init_t", "sshd_t", "shell_t", "passwd_t"])
+        self.assertEqual(g.shortest_path("httpd_t", "httpd_t"), ["httpd_t", "script_t", "httpd_t"])
+        self.assertEqual(g.shortest_path("sendmail_t", "sendmail_t"), ["sendmail_t", "sendmail_t"])
+        self.assertEqual(g.shortest_path("shell_t", "httpd_t"), None)
+        self.assertEqual(g.shortest_path("passwd_t", "passwd_t"), None)
+
+    def test_all_paths(self):
+        "Verify all transition paths do not loop"
+        g = self.graph
+        self.assertEqual(sorted(g.all_paths("init_t", "sendmail_t")),
+                         [["init_t", "httpd_t", "script_t", "sendmail_t"],
+                          ["init_t", "sshd_t", "shell_t", "sendmail_t"]])
+        self.assertEqual(g.all_paths("httpd_t", "httpd_t"), [["httpd_t", "script_t", "httpd_t"]])
+        self.assertEqual(g.all_paths("sshd_t", "passwd_t"), [["sshd_t", "shell_t", "passwd_t"]])
+        self.assertEqual(g.all_paths("sendmail_t", "httpd_t"), [])
+
+    def test_get_conditionals(self):
+        "Verify the booleans of transitions"
+        g = self.graph
+        self.assertEqual(g.get_conditionals("httpd_t", "script_t"),
+                         [{"source": "httpd_t", "boolean": [("httpd_enable_cgi", 1)]}])
+        self.assertEqual(g.get_conditionals("init_t", "httpd_t"), [])
+        # The transition is also allowed unconditionally, through the
+        # login_domain attribute, so no booleans are needed for it.
+        self.assertEqual(g.get_conditionals("shell_t", "sendmail_t"), [])
+        self.assertEqual(g.get_conditionals("script_t", "sendmail_t"), [])
+
+    def test_get_transitions(self):
+        "Verify the transitions of a domain include its attributes' rules"
+        trans = self.graph.get_transitions("shell_t")
+        self.assertEqual(sorted([t["transtype"] for t in trans]), ["passwd_t", "sendmail_t", "sshd_t"])
+        self.assertEqual(sorted(self.graph.all_transitions(["sendmail_t"])["sendmail_t"][0].items()),
+                         [("class", "process"), ("source", "sendmail_t"),
+                          ("target", "sendmail_exec_t"), ("transtype", "sendmail_t")])
+
 if __name__ == "__main__":
     import selinux
     if selinux.security_getenforce() == 1:
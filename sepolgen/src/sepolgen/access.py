@@ -257,6 +257,20 @@ class AccessVectorSet:
         for av in l:
             self.add_av(AccessVector(av))
 
+    def split_by_src(self):
+        """Partition the access vector set by source type.
+
+        Returns a dictionary mapping each source type to an access
+        vector set holding only the access vectors for that source.
+        The access vectors are shared with this set, not copied.
+        """
+        parts = { }
+        for src_type, tgts in self.src.items():
+            avs = AccessVectorSet()
+            avs.src[src_type] = tgts
+            parts[src_type] = avs
+        return parts
+
     def add(self, src_type, tgt_type, obj_class, perms, audit_msg=None, avc_type=audit2why.TERULE, data=[]):
         """Add an access vector to the set.
         """
@@ -282,6 +296,36 @@ class AccessVectorSet:
         """Add an access vector to the set."""
         self.add(av.src_type, av.tgt_type, av.obj_class, av.perms)
 
+    def difference(self, other):
+        """Return the access in this set that other does not allow.
+
+        The returned access vector set holds, for each access vector
+        in this set, the permissions that are not in the matching
+        access vector (same source, target and class) in other. A
+        target of "self" in other matches a target equal to the
+        source. Access vectors with nothing left are dropped; the
+        rest keep their audit messages.
+        """
+        d = AccessVectorSet()
+        for av in self:
+            tgts = other.src.get(av.src_type, { })
+            names = [av.tgt_type]
+            if av.tgt_type == av.src_type:
+                names.append("self")
+
+            perms = refpolicy.IdSet(av.perms)
+            for name in names:
+                for (obj_class, avc_type), x in tgts.get(name, { }).items():
+                    if obj_class == av.obj_class:
+                        perms.difference_update(x.perms)
+            if not perms:
+                continue
+
+            d.add(av.src_type, av.tgt_type, av.obj_class, perms,
+                  avc_type=av.type, data=av.data)
+            d.src[av.src_type][av.tgt_type][av.obj_class, av.type].audit_msgs.extend(av.audit_msgs)
+        return d
+
 
 def avs_extract_types(avs):
     types = refpolicy.IdSet()
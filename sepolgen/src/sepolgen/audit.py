@@ -19,10 +19,12 @@
 
 import re
 import sys
+import time
 
 from . import refpolicy
 from . import access
 from . import util
+from .stats import stats
 # Convenience functions
 
 def get_audit_boot_msgs():
@@ -109,6 +111,34 @@ class AuditMessage:
                 return
 
 
+_time_re = re.compile(r"audit\((\d+(?:\.\d+)?):")
+
+def message_time(msg):
+    """Return the time of an audit message in seconds since the epoch,
+    or None if its header has no time."""
+    m = _time_re.search(msg.header)
+    if not m:
+        return None
+    return float(m.group(1))
+
+_time_formats = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"]
+
+def parse_time(s):
+    """Parse a time given as seconds since the epoch or as a local time
+    in the form YYYY-MM-DD[ HH:MM[:SS]] into seconds since the epoch.
+
+    Raises ValueError if the time is in neither form."""
+    try:
+        return float(s)
+    except ValueError:
+        pass
+    for format in _time_formats:
+        try:
+            return time.mktime(time.strptime(s, format))
+        except ValueError:
+            continue
+    raise ValueError("invalid time %s" % s)
+
 class InvalidMessage(AuditMessage):
     """Class representing invalid audit messages. This is used to differentiate
     between audit messages that aren't recognized (that should return None from
@@ -202,7 +232,9 @@ class AVCMessage(AuditMessage):
         return i + 1
         
 
-    def from_split_string(self, recs):
+    def from_split_string(self, recs, analyze=True):
+        """Parse the message and, unless analyze is False, check the
+        access against the policy (see analyze)."""
         AuditMessage.from_split_string(self, recs)        
         # FUTURE - fully parse avc messages and store all possible fields
         # Required fields
@@ -240,7 +272,8 @@ class AVCMessage(AuditMessage):
 
         if not found_src or not found_tgt or not found_class or not found_access:
             raise ValueError("AVC message in invalid format [%s]\n" % self.message)
-        self.analyze()
+        if analyze:
+            self.analyze()
 
     def analyze(self):
         tcontext = self.tcontext.to_string()
@@ -248,10 +281,15 @@ class AVCMessage(AuditMessage):
         access_tuple = tuple( self.accesses)
         self.data = []
 
-        if (scontext, tcontext, self.tclass, access_tuple) in avcdict.keys():
+        if (scontext, tcontext, self.tclass, access_tuple) in avcdict:
+            if stats.enabled:
+                stats.count("avcdict_hits")
             self.type, self.data = avcdict[(scontext, tcontext, self.tclass, access_tuple)]
         else:
-            self.type, self.data = audit2why.analyze(scontext, tcontext, self.tclass, self.accesses);
+            if stats.enabled:
+                stats.count("avcdict_misses")
+            with stats.phase("analyze"):
+                self.type, self.data = audit2why.analyze(scontext, tcontext, self.tclass, self.accesses);
             if self.type == audit2why.NOPOLICY:
                 self.type = audit2why.TERULE
             if self.type == audit2why.BADTCON:
@@ -348,10 +386,25 @@ class AuditParser:
     AuditParser.last_load_only is set to true. It is assumed that messages
     are fed to the parser in chronological order - time stamps are not
     parsed.
+
+    If a msg_filter (e.g., a MessageFilter) is passed in, the AVC and
+    compute sid messages it rejects are dropped as they are parsed -
+    AVC messages are filtered before they are checked against the
+    policy, so the dropped messages never cost a policy lookup.
+
+    If an avc_sink is passed in - an object with add(avc) and clear()
+    methods, e.g., a report.DenialReport - the AVC messages are passed
+    to it instead of being stored in avc_msgs, so memory does not grow
+    with the size of the log. Each message is passed on once the audit
+    event it is part of ends, with the path of the event's AVC_PATH
+    message; the records of an event are expected to be together in
+    the log. The sink is cleared along with the lists.
     """
-    def __init__(self, last_load_only=False):
+    def __init__(self, last_load_only=False, msg_filter=None, avc_sink=None):
+        self.avc_sink = avc_sink
         self.__initialize()
         self.last_load_only = last_load_only
+        self.msg_filter = msg_filter
 
     def __initialize(self):
         self.avc_msgs = []
@@ -361,6 +414,10 @@ class AuditParser:
         self.path_msgs = []
         self.by_header = { }
         self.check_input_file = False
+        # The AVC and path messages of the current event for avc_sink.
+        self.__event = []
+        if self.avc_sink is not None:
+            self.avc_sink.clear()
                 
     # Low-level parsing function - tries to determine if this audit
     # message is an SELinux related message and then parses it into
@@ -398,12 +455,27 @@ class AuditParser:
             if found:
                 self.check_input_file = True
                 try:
-                    msg.from_split_string(rec)
+                    if isinstance(msg, AVCMessage):
+                        msg.from_split_string(rec, analyze=False)
+                        if not self.__wanted(msg):
+                            return None
+                        msg.analyze()
+                    else:
+                        msg.from_split_string(rec)
+                        if isinstance(msg, ComputeSidMessage) and not self.__wanted(msg):
+                            return None
                 except ValueError:
                     msg = InvalidMessage(line)
                 return msg
         return None
 
+    def __wanted(self, msg):
+        if self.msg_filter is None or self.msg_filter.filter(msg):
+            return True
+        if stats.enabled:
+            stats.count("filtered_msgs")
+        return False
+
     # Higher-level parse function - take a line, parse it into an
     # AuditMessage object, and store it in the appropriate list.
     # This function will optionally reset all of the lists when
@@ -414,6 +486,15 @@ class AuditParser:
         if msg is None:
             return
 
+        if self.avc_sink is not None:
+            if self.__event and self.__event[0].header != msg.header:
+                self.__end_event()
+            if isinstance(msg, AVCMessage) or isinstance(msg, PathMessage):
+                self.__event.append(msg)
+                if msg.header == "":
+                    self.__end_event()
+                return
+
         # Append to the correct list
         if isinstance(msg, PolicyLoadMessage):
             if self.last_load_only:
@@ -443,10 +524,24 @@ class AuditParser:
                 self.by_header[msg.header] = [msg]
             
 
+    def __end_event(self):
+        path = None
+        for msg in self.__event:
+            if isinstance(msg, PathMessage):
+                path = msg
+        for msg in self.__event:
+            if isinstance(msg, AVCMessage):
+                if path:
+                    msg.path = path.path
+                self.avc_sink.add(msg)
+        self.__event = []
+
     # Post processing will add additional information from AVC messages
     # from related messages - only works on messages generated by
     # the audit system.
     def __post_process(self):
+        if self.__event:
+            self.__end_event()
         for value in self.by_header.values():
             avc = []
             path = None
@@ -462,15 +557,31 @@ class AuditParser:
     def parse_file(self, input):
         """Parse the contents of a file object. This method can be called
         multiple times (along with parse_string)."""
+        n = 0
         line = input.readline()
         while line:
             self.__parse(line)
+            n += 1
             line = input.readline()
+        stats.count("lines", n)
         if not self.check_input_file:
             sys.stderr.write("Nothing to do\n")
             sys.exit(0)
         self.__post_process()
 
+    def parse_lines(self, lines):
+        """Parse audit messages from an iterable of lines, e.g., a file
+        object, reading one line at a time. Unlike parse_file this
+        does not exit if there are no audit messages. This method can
+        be called multiple times (along with parse_file and
+        parse_string)."""
+        n = 0
+        for line in lines:
+            self.__parse(line)
+            n += 1
+        stats.count("lines", n)
+        self.__post_process()
+
     def parse_string(self, input):
         """Parse a string containing audit messages - messages should
         be separated by new lines. This method can be called multiple
@@ -478,6 +589,7 @@ class AuditParser:
         lines = input.split('\n')
         for l in lines:
             self.__parse(l)
+        stats.count("lines", len(lines))
         self.__post_process()
 
     def to_role(self, role_filter=None):
@@ -540,6 +652,42 @@ class AVCTypeFilter:
             return True
         return False
 
+class DenialFilter:
+    """Filter out granted messages, leaving the denials.
+
+    Another filter object can be passed in to be applied as well.
+    """
+    def __init__(self, avc_filter=None):
+        self.avc_filter = avc_filter
+
+    def filter(self, avc):
+        if not avc.denial:
+            return False
+        if self.avc_filter:
+            return self.avc_filter.filter(avc)
+        return True
+
+class MissingAccessFilter:
+    """Filter out denials that the loaded policy already allows.
+
+    Every AVC message is checked against the policy when it is parsed
+    (see AVCMessage.analyze) and the verdicts are shared by all of the
+    messages for the same contexts, class and permissions, so this is
+    a lookup rather than a new policy query. Stale logs from before a
+    policy update are the common source of such denials.
+
+    Another filter object can be passed in to be applied as well.
+    """
+    def __init__(self, avc_filter=None):
+        self.avc_filter = avc_filter
+
+    def filter(self, avc):
+        if avc.type == audit2why.ALLOW:
+            return False
+        if self.avc_filter:
+            return self.avc_filter.filter(avc)
+        return True
+
 class ComputeSidTypeFilter:
     def __init__(self, regex):
         self.regex = re.compile(regex)
@@ -553,4 +701,142 @@ class ComputeSidTypeFilter:
             return True
         return False
 
-
+class MessageFilter:
+    """Include / exclude filter for AVC and compute sid messages.
+
+    Patterns are regular expressions matched (with re.match) against
+    a field of the messages:
+
+       type - the source or target type or, for compute sid messages,
+          the invalid context type (as AVCTypeFilter and
+          ComputeSidTypeFilter)
+       source - the source type
+       target - the target type
+       class - the object class
+       perm - a permission (AVC messages only)
+       comm - the process name (AVC messages only)
+       exe - the on-disc binary (AVC messages only)
+
+    A message passes if, for each field with include patterns, one of
+    them matches, no exclude pattern matches and its time is within
+    since and until. For type and perm a single matching value is
+    enough to include - or exclude - the message. Fields that a
+    message does not have and, for the time range, messages without a
+    time are not checked.
+
+    There are few distinct types, classes, etc. in a log, so the
+    verdict of the patterns on each value is cached and filtering
+    usually costs a dictionary lookup per field.
+    """
+    FIELDS = ["type", "source", "target", "class", "perm", "comm", "exe"]
+
+    def __init__(self, expressions=[]):
+        self.include = { }
+        self.exclude = { }
+        self.since = None
+        self.until = None
+        # field -> value -> (included, excluded)
+        self.__verdicts = { }
+        for expr in expressions:
+            self.add_expression(expr)
+
+    def add(self, field, regex, exclude=False):
+        if field not in self.FIELDS:
+            raise ValueError("unknown filter field %s" % field)
+        try:
+            r = re.compile(regex)
+        except re.error as e:
+            raise ValueError("invalid regular expression %s: %s" % (regex, str(e)))
+        if exclude:
+            self.exclude.setdefault(field, []).append(r)
+        else:
+            self.include.setdefault(field, []).append(r)
+        self.__verdicts.pop(field, None)
+
+    def add_expression(self, expr):
+        """Add a filter expression: field=regex includes the messages
+        whose field matches, field!=regex excludes them and since=time
+        and until=time limit the time of the messages (see parse_time).
+
+        Raises ValueError if the expression is not valid."""
+        i = expr.find("=")
+        if i < 1:
+            raise ValueError("invalid filter expression %s" % expr)
+        field = expr[:i]
+        value = expr[i+1:]
+        exclude = field.endswith("!")
+        if exclude:
+            field = field[:-1]
+        if field == "since" and not exclude:
+            self.since = parse_time(value)
+        elif field == "until" and not exclude:
+            self.until = parse_time(value)
+        else:
+            self.add(field, value, exclude)
+
+    def __verdict(self, field, value):
+        verdicts = self.__verdicts.setdefault(field, { })
+        v = verdicts.get(value)
+        if v is None:
+            include = self.include.get(field)
+            if include:
+                included = False
+                for r in include:
+                    if r.match(value):
+                        included = True
+                        break
+            else:
+                included = True
+            excluded = False
+            for r in self.exclude.get(field, []):
+                if r.match(value):
+                    excluded = True
+                    break
+            v = (included, excluded)
+            verdicts[value] = v
+        return v
+
+    def __values(self, msg, field):
+        if field == "type":
+            if isinstance(msg, ComputeSidMessage):
+                return [msg.invalid_context.type, msg.scontext.type, msg.tcontext.type]
+            return [msg.scontext.type, msg.tcontext.type]
+        elif field == "source":
+            return [msg.scontext.type]
+        elif field == "target":
+            return [msg.tcontext.type]
+        elif field == "class":
+            return [msg.tclass]
+        elif not isinstance(msg, AVCMessage):
+            return None
+        elif field == "perm":
+            return msg.accesses
+        elif field == "comm":
+            return [msg.comm]
+        else:
+            return [msg.exe]
+
+    def filter(self, msg):
+        if self.since is not None or self.until is not None:
+            t = message_time(msg)
+            if t is not None:
+                if self.since is not None and t < self.since:
+                    return False
+                if self.until is not None and t > self.until:
+                    return False
+        for field in self.FIELDS:
+            if field not in self.include and field not in self.exclude:
+                continue
+            values = self.__values(msg, field)
+            if values is None:
+                continue
+            included = False
+            for value in values:
+                inc, exc = self.__verdict(field, value)
+                if exc:
+                    return False
+                if inc:
+                    included = True
+            if not included:
+                return False
+        return True
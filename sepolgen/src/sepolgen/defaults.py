@@ -67,6 +67,12 @@ def interface_info():
 def attribute_info():
     return data_dir() + "/attribute_info"
 
+def headers_snapshot_dir():
+    return data_dir() + "/headers"
+
+def module_cache_dir():
+    return data_dir() + "/modules"
+
 def refpolicy_makefile():
     chooser = PathChoooser("/etc/selinux/sepolgen.conf")
     return chooser("Makefile")
@@ -239,6 +239,24 @@ class AttributeSet:
         if a:
             self.add_attr(a)
 
+    def from_rules(self, names, rules):
+        """Add the access allowed to attributes from policy rules.
+
+        names is an iterable of attribute names - each gets an entry
+        even if it has no access. rules is an iterable of (source,
+        target, class, perms) tuples; rules whose source is not one of
+        the attributes are skipped, so the rules can be streamed
+        straight from a policy query without filtering them first.
+        """
+        for name in names:
+            a = AttributeVector()
+            a.name = name
+            self.add_attr(a)
+        for src, tgt, obj_class, perms in rules:
+            a = self.attributes.get(src)
+            if a:
+                a.access.add(src, tgt, obj_class, perms)
+
 class InterfaceVector:
     def __init__(self, interface=None, attributes={}):
         # Enabled is a loose concept currently - we are essentially
@@ -431,6 +449,24 @@ class InterfaceSet:
             return [id]
 
     def map_add_av(self, ifv, av, ifcall):
+        self.__map_av(ifv.access, av, ifcall)
+
+    def ifcall_access(self, ifcall):
+        """Return the access allowed by an interface call.
+
+        The access of the called interface is returned as an
+        AccessVectorSet with the arguments of the call in place of
+        the parameters. The set is empty if the interface is unknown.
+        """
+        avs = access.AccessVectorSet()
+        ifv = self.interfaces.get(ifcall.ifname)
+        if ifv is None:
+            return avs
+        for av in ifv.access:
+            self.__map_av(avs, av, ifcall)
+        return avs
+
+    def __map_av(self, avs, av, ifcall):
         src_types = self.map_param(av.src_type, ifcall)
         if src_types is None:
             return
@@ -456,7 +492,7 @@ class InterfaceSet:
         for src_type in src_types:
             for tgt_type in tgt_types:
                 for obj_class in obj_classes:
-                    ifv.access.add(src_type, tgt_type, obj_class, new_perms)
+                    avs.add(src_type, tgt_type, obj_class, new_perms)
 
     def do_expand_ifcalls(self, interface, if_by_name):
         # Descend an interface call tree adding the access
@@ -28,9 +28,12 @@ try:
     from subprocess import getstatusoutput
 except ImportError:
     from commands import getstatusoutput
+import hashlib
 import os
 import os.path
 import shutil
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 
 import selinux
 
@@ -112,6 +115,24 @@ class ModuleCompiler:
                    packager. Defaults to /usr/bin/semodule_package.
      .output       [file object] File object used to write verbose
                    output of the compililation and packaging process.
+
+     .cache_dir    [string] Directory of the package cache used by
+                   create_module_packages. Packages are stored by a hash
+                   of the module sources and of the build tools - and,
+                   for refpolicy builds, of the files in .headers - so an
+                   unchanged module is never rebuilt. None disables the
+                   cache. Defaults to defaults.module_cache_dir().
+
+     .cache_size   [int] Maximum number of packages kept in the cache.
+                   The least recently used ones are removed when a
+                   package is stored. Defaults to 256.
+
+     .headers      [string] Directory of the refpolicy headers the
+                   refpolicy makefile builds against. Defaults to
+                   defaults.headers().
+
+     .jobs         [int] Maximum number of modules create_module_packages
+                   builds at once. Defaults to the number of CPUs.
     """
     def __init__(self, output=None):
         """Create a ModuleCompiler instance, optionally with an
@@ -125,6 +146,11 @@ class ModuleCompiler:
         self.last_output = ""
         self.refpol_makefile = defaults.refpolicy_makefile()
         self.make = "/usr/bin/make"
+        self.cache_dir = defaults.module_cache_dir()
+        self.cache_size = 256
+        self.headers = defaults.headers()
+        self.jobs = None
+        self.__ids = None
 
     def o(self, str):
         if self.output:
@@ -214,3 +240,248 @@ class ModuleCompiler:
             raise RuntimeError("packaging failed [%s]" % self.last_output)
         
     
+
+    def __remember(self, path, compute):
+        # The identities of the tools and headers are computed once
+        # for a whole batch - see create_module_packages.
+        if self.__ids is None:
+            return compute(path)
+        if path not in self.__ids:
+            self.__ids[path] = compute(path)
+        return self.__ids[path]
+
+    def __file_id(self, path):
+        # Identify a file by its contents.
+        try:
+            fd = open(path, "rb")
+        except IOError:
+            return "%s missing" % path
+        h = hashlib.sha256()
+        try:
+            buf = fd.read(1 << 16)
+            while buf:
+                h.update(buf)
+                buf = fd.read(1 << 16)
+        finally:
+            fd.close()
+        return "%s %s" % (path, h.hexdigest())
+
+    def __tool_id(self, path):
+        return self.__remember(path, self.__file_id)
+
+    def __read_tree_id(self, dirname):
+        h = hashlib.sha256()
+        for root, dirs, files in os.walk(dirname):
+            dirs.sort()
+            for name in sorted(files):
+                h.update((self.__file_id(os.path.join(root, name)) + "\n").encode("utf-8"))
+        return "%s %s" % (dirname, h.hexdigest())
+
+    def __tree_id(self, dirname):
+        # Identify a directory tree by the name and contents of every
+        # file in it.
+        return self.__remember(dirname + "/", self.__read_tree_id)
+
+    def cache_key(self, sourcename, refpolicy=True):
+        """Return the package cache key for a module source file.
+
+        The key is a hash of the .te file and, if present, the .fc and
+        .if files next to it, plus the build options and the identity
+        and contents of the build tools. For refpolicy builds the name
+        and contents of every file in the .headers tree are included as
+        well.
+
+        Raises IOError if a source file cannot be read.
+        """
+        h = hashlib.sha256()
+        if refpolicy:
+            tools = [self.make, self.refpol_makefile]
+        else:
+            tools = [self.checkmodule, self.semodule_package]
+        opts = "refpolicy=%s mls=%s module=%s\n" % (bool(refpolicy), bool(self.mls), bool(self.module))
+        h.update(opts.encode("utf-8"))
+        for tool in tools:
+            h.update((self.__tool_id(tool) + "\n").encode("utf-8"))
+        if refpolicy:
+            h.update((self.__tree_id(self.headers) + "\n").encode("utf-8"))
+
+        basename = os.path.splitext(sourcename)[0]
+        for name in (sourcename, basename + ".fc", basename + ".if"):
+            if name != sourcename and not os.path.exists(name):
+                continue
+            fd = open(name, "rb")
+            data = fd.read()
+            fd.close()
+            h.update(os.path.splitext(name)[1].encode("utf-8") + b"\0")
+            h.update(hashlib.sha256(data).digest())
+        return h.hexdigest()
+
+    def __cache_name(self, key):
+        return os.path.join(self.cache_dir, key + ".pp")
+
+    def __cache_store(self, key, packagename):
+        # Best effort - a read only cache just means we rebuild.
+        try:
+            if not os.path.isdir(self.cache_dir):
+                try:
+                    os.makedirs(self.cache_dir)
+                except OSError:
+                    # Another job may have created it meanwhile.
+                    if not os.path.isdir(self.cache_dir):
+                        raise
+            fd, tmpname = tempfile.mkstemp(dir=self.cache_dir, prefix=".pp")
+            os.close(fd)
+            shutil.copyfile(packagename, tmpname)
+            os.rename(tmpname, self.__cache_name(key))
+        except (IOError, OSError):
+            return
+        self.__cache_prune()
+
+    def __cache_prune(self):
+        # Remove the least recently used packages - a package's
+        # modification time is updated whenever it is used.
+        try:
+            names = [x for x in os.listdir(self.cache_dir) if x.endswith(".pp")]
+            if len(names) <= self.cache_size:
+                return
+            entries = []
+            for name in names:
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    pass
+            entries.sort()
+            for mtime, path in entries[:len(entries) - self.cache_size]:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        except OSError:
+            pass
+
+    def __build(self, sourcename, refpolicy):
+        # Build one module without touching shared state so that it
+        # can run in a worker thread. Returns the log of the commands
+        # run and raises RuntimeError on failure.
+        log = []
+        def run(command):
+            rc, output = getstatusoutput(command)
+            log.append(command)
+            log.append(output)
+            return rc, output
+
+        modname, packagename = self.gen_filenames(sourcename)
+        if refpolicy:
+            # The refpolicy makefile builds in a tmp directory under the
+            # directory it is run in, so each module is built in a
+            # directory of its own and the package copied out.
+            builddir = tempfile.mkdtemp(prefix="sepolgen-")
+            try:
+                basename = os.path.splitext(sourcename)[0]
+                for name in (sourcename, basename + ".fc", basename + ".if"):
+                    if name == sourcename or os.path.exists(name):
+                        shutil.copyfile(name, os.path.join(builddir, os.path.basename(name)))
+                rc, output = run("%s -C %s -f %s %s" % (self.make, builddir, os.path.abspath(self.refpol_makefile),
+                                                        os.path.basename(packagename)))
+                if rc != 0:
+                    raise RuntimeError("compilation failed:\n%s" % output)
+                shutil.copyfile(os.path.join(builddir, os.path.basename(packagename)), packagename)
+            except (IOError, OSError) as e:
+                raise RuntimeError("compilation failed: %s" % str(e))
+            finally:
+                shutil.rmtree(builddir, True)
+            return log
+
+        s = [self.checkmodule]
+        if self.mls:
+            s.append("-M")
+        if self.module:
+            s.append("-m")
+        s.extend(["-o", modname, sourcename])
+        rc, output = run(" ".join(s))
+        if rc != 0:
+            raise RuntimeError("compilation failed:\n%s" % output)
+
+        rc, output = run(" ".join([self.semodule_package, "-o", packagename, "-m", modname]))
+        os.unlink(modname)
+        if rc != 0:
+            raise RuntimeError("packaging failed [%s]" % output)
+        return log
+
+    def __create_one(self, sourcename, refpolicy):
+        modname, packagename = self.gen_filenames(sourcename)
+        key = None
+        if self.cache_dir:
+            try:
+                key = self.cache_key(sourcename, refpolicy)
+            except (IOError, OSError) as e:
+                return (packagename, False, [], str(e))
+            try:
+                shutil.copyfile(self.__cache_name(key), packagename)
+                os.utime(self.__cache_name(key), None)
+                return (packagename, True, [], None)
+            except (IOError, OSError):
+                pass
+        try:
+            log = self.__build(sourcename, refpolicy)
+        except RuntimeError as e:
+            return (packagename, False, [], str(e))
+        if key:
+            self.__cache_store(key, packagename)
+        return (packagename, False, log, None)
+
+    def create_module_packages(self, sourcenames, refpolicy=True):
+        """Create module packages for several source files at once.
+
+        This is the batch version of create_module_package. Up to .jobs
+        modules are built concurrently. If .cache_dir is set, a module
+        whose sources and build tools are unchanged since it was last
+        built is copied from the cache instead of being rebuilt.
+
+        Refpolicy builds run the refpolicy makefile for just the
+        module's package in a temporary directory holding a copy of the
+        module's sources, and the package is copied next to the source
+        file.
+
+        Returns a list of (sourcename, packagename, cached) tuples in
+        the order of sourcenames, where cached is True if the package
+        came from the cache. If any module fails to build, all of the
+        others are still built and a RuntimeError describing every
+        failure is raised at the end.
+        """
+        sourcenames = list(sourcenames)
+        jobs = self.jobs or cpu_count()
+        jobs = max(1, min(jobs, len(sourcenames)))
+
+        # The tools and the headers tree are only read once for the
+        # whole batch.
+        self.__ids = { }
+        if refpolicy and self.cache_dir:
+            self.__tree_id(self.headers)
+
+        try:
+            if jobs == 1:
+                results = [self.__create_one(x, refpolicy) for x in sourcenames]
+            else:
+                pool = ThreadPool(jobs)
+                try:
+                    results = pool.map(lambda x: self.__create_one(x, refpolicy), sourcenames)
+                finally:
+                    pool.close()
+                    pool.join()
+        finally:
+            self.__ids = None
+
+        ret = []
+        errors = []
+        for sourcename, (packagename, cached, log, error) in zip(sourcenames, results):
+            for line in log:
+                self.o(line)
+            if error:
+                errors.append("%s: %s" % (sourcename, error))
+            else:
+                ret.append((sourcename, packagename, cached))
+        if errors:
+            raise RuntimeError("\n".join(errors))
+        return ret
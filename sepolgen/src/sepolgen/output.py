@@ -30,9 +30,6 @@ cleanly separated from the formatting issues.
 from . import refpolicy
 from . import util
 
-if util.PY3:
-    from .util import cmp
-
 
 class ModuleWriter:
     def __init__(self):
@@ -40,6 +37,9 @@ class ModuleWriter:
         self.module = None
         self.sort = True
         self.requires = True
+        # Output is collected and written in chunks of roughly this
+        # many characters rather than one write per statement.
+        self.chunk_size = 64 * 1024
 
     def write(self, module, fd):
         self.module = module
@@ -48,65 +48,49 @@ class ModuleWriter:
             sort_filter(self.module)
 
         # FIXME - make this handle nesting
-        for node, depth in refpolicy.walktree(self.module, showdepth=True):
-            fd.write("%s\n" % str(node))
+        buf = []
+        size = 0
+        for node in refpolicy.walktree(self.module):
+            s = "%s\n" % str(node)
+            buf.append(s)
+            size += len(s)
+            if size >= self.chunk_size:
+                fd.write("".join(buf))
+                buf = []
+                size = 0
+        if buf:
+            fd.write("".join(buf))
 
 # Helper functions for sort_filter - this is all done old school
 # C style rather than with polymorphic methods because this sorting
 # is specific to output. It is not necessarily the comparison you
 # want generally.
-
-# Compare two IdSets - we could probably do something clever
-# with different here, but this works.
-def id_set_cmp(x, y):
-    xl = util.set_to_list(x)
-    xl.sort()
-    yl = util.set_to_list(y)
-    yl.sort()
-
-    if len(xl) != len(yl):
-        return cmp(xl[0], yl[0])
-    for v in zip(xl, yl):
-        if v[0] != v[1]:
-            return cmp(v[0], v[1])
-    return 0
-
-# Compare two avrules
-def avrule_cmp(a, b):
-    ret = id_set_cmp(a.src_types, b.src_types)
-    if ret is not 0:
-        return ret
-    ret = id_set_cmp(a.tgt_types, b.tgt_types)
-    if ret is not 0:
-        return ret
-    ret = id_set_cmp(a.obj_classes, b.obj_classes)
-    if ret is not 0:
-        return ret
-
-    # At this point, who cares - just return something
-    return cmp(len(a.perms), len(b.perms))
-
-# Compare two interface calls
-def ifcall_cmp(a, b):
-    if a.args[0] != b.args[0]:
-        return cmp(a.args[0], b.args[0])
-    return cmp(a.ifname, b.ifname)
-
-# Compare an two avrules or interface calls
-def rule_cmp(a, b):
-    if isinstance(a, refpolicy.InterfaceCall):
-        if isinstance(b, refpolicy.InterfaceCall):
-            return ifcall_cmp(a, b)
+#
+# Each rule gets a sort key that is computed once. Rules are grouped by
+# source type (which we assume is the first argument for interfaces),
+# with allow rules ahead of interface calls for the same source. Allow
+# rules are then ordered by target types, object classes and the number
+# of permissions; interface calls by interface name.
+
+def id_set_key(s):
+    l = util.set_to_list(s)
+    l.sort()
+    return tuple(l)
+
+def rule_key(rule):
+    if isinstance(rule, refpolicy.InterfaceCall):
+        arg = rule.args[0]
+        if isinstance(arg, list):
+            src = id_set_key(arg)
         else:
-            return id_set_cmp([a.args[0]], b.src_types)
+            src = (arg,)
+        return (src, 1, (), (), 0, rule.ifname)
     else:
-        if isinstance(b, refpolicy.AVRule):
-            return avrule_cmp(a,b)
-        else:
-            return id_set_cmp(a.src_types, [b.args[0]])
-                
-def role_type_cmp(a, b):
-    return cmp(a.role, b.role)
+        return (id_set_key(rule.src_types), 0, id_set_key(rule.tgt_types),
+                id_set_key(rule.obj_classes), len(rule.perms), "")
+
+def role_type_key(role_type):
+    return role_type.role
 
 def sort_filter(module):
     """Sort and group the output for readability.
@@ -114,24 +98,36 @@ def sort_filter(module):
     def sort_node(node):
         c = []
 
+        # Collect the statements we reorder in a single pass over
+        # the tree.
+        mods = []
+        requires = []
+        rules = []
+        ras = []
+        for x in refpolicy.walktree(node):
+            if isinstance(x, refpolicy.ModuleDeclaration):
+                mods.append(x)
+            elif isinstance(x, refpolicy.Require):
+                requires.append(x)
+            elif isinstance(x, (refpolicy.AVRule, refpolicy.InterfaceCall)):
+                rules.append(x)
+            elif isinstance(x, refpolicy.RoleType):
+                ras.append(x)
+
         # Module statement
-        for mod in node.module_declarations():
+        for mod in mods:
             c.append(mod)
             c.append(refpolicy.Comment())
 
         # Requires
-        for require in node.requires():
-            c.append(require)
+        c.extend(requires)
         c.append(refpolicy.Comment())
 
         # Rules
         #
         # We are going to group output by source type (which
         # we assume is the first argument for interfaces).
-        rules = []
-        rules.extend(node.avrules())
-        rules.extend(node.interface_calls())
-        rules.sort(key=util.cmp_to_key(rule_cmp))
+        rules.sort(key=rule_key)
 
         cur = None
         sep_rules = []
@@ -153,9 +149,7 @@ def sort_filter(module):
         c.extend(sep_rules)
 
 
-        ras = []
-        ras.extend(node.role_types())
-        ras.sort(key=util.cmp_to_key(role_type_cmp))
+        ras.sort(key=role_type_key)
         if len(ras):
             comment = refpolicy.Comment()
             comment.lines.append("============= ROLES ==============")
@@ -164,14 +158,14 @@ def sort_filter(module):
 
         c.extend(ras)
 
-        # Everything else
+        # Everything else - membership is by identity so this is
+        # linear and never calls the statements' comparison methods.
+        seen = set([id(x) for x in c])
         for child in node.children:
-            if child not in c:
+            if id(child) not in seen:
                 c.append(child)
 
         node.children = c
 
     for node in module.nodes():
         sort_node(node)
-
-
@@ -36,6 +36,7 @@ from . import access
 from . import interfaces
 from . import matching
 from . import util
+from .stats import stats
 # Constants for the level of explanation from the generation
 # routines
 NO_EXPLANATION    = 0
@@ -77,13 +78,19 @@ class PolicyGenerator:
         self.explain = NO_EXPLANATION
         self.gen_requires = False
         if module:
-            self.moduel = module
+            self.module = module
         else:
             self.module = refpolicy.Module()
 
         self.dontaudit = False
+        self.minimize = False
+        self.support_macros = None
 
         self.domains = None
+        # Types each source can already write, keyed by the
+        # (source, class, perms) that was searched for - see
+        # __lookup_write_targets.
+        self.write_targets = { }
     def set_gen_refpol(self, if_set=None, perm_maps=None):
         """Set whether reference policy interfaces are generated.
 
@@ -120,6 +127,19 @@ class PolicyGenerator:
     def set_gen_dontaudit(self, dontaudit):
         self.dontaudit = dontaudit
 
+    def set_gen_minimize(self, status=True, support_macros=None):
+        """Set whether the generated rules are minimized.
+
+        If status is True the rules are combined into as few
+        statements as possible when the module is retrieved with
+        .get_module - see minimize_rules. If support_macros (a
+        refpolicy.SupportMacros) is passed in, permission sets are
+        also replaced by the matching obj_perm_sets macros, which is
+        only valid in reference policy modules.
+        """
+        self.minimize = status
+        self.support_macros = support_macros
+
     def __set_module_style(self):
         if self.ifgen:
             refpolicy = True
@@ -150,10 +170,66 @@ class PolicyGenerator:
         if self.gen_requires:
             gen_requires(self.module)
 
+        # Minimize after the requires are generated so that they list
+        # the individual permissions rather than the macros.
+        if self.minimize:
+            self.__minimize()
+
         """Return the generated module"""
         return self.module
 
+    def __minimize(self):
+        rules = [x for x in self.module.children if isinstance(x, refpolicy.AVRule)]
+        if not rules:
+            return
+        first = self.module.children.index(rules[0])
+        children = [x for x in self.module.children if not isinstance(x, refpolicy.AVRule)]
+        minimized = minimize_rules(rules, self.support_macros)
+        for rule in minimized:
+            rule.parent = self.module
+        children[first:first] = minimized
+        self.module.children = children
+
+    def __wants_write_targets(self, av):
+        return (av.type == audit2why.TERULE and
+                "write" in av.perms and
+                ( "dir" in av.obj_class or "open" in av.perms ))
+
+    def __write_targets_key(self, av):
+        perms = list(av.perms)
+        perms.sort()
+        return (av.src_type, av.obj_class, tuple(perms))
+
+    def __lookup_write_targets(self, avs):
+        """Find the non-domain types each source can already write.
+
+        All of the access vectors are examined up front and the policy
+        is searched once per distinct (source, class, perms) - results
+        are kept in self.write_targets for the lifetime of the
+        generator, so repeated access never causes another search.
+        """
+        domains = None
+        for av in avs:
+            if not self.__wants_write_targets(av):
+                continue
+            key = self.__write_targets_key(av)
+            if key in self.write_targets:
+                continue
+            types = []
+            try:
+                if not self.domains:
+                    self.domains = seinfo(ATTRIBUTE, name="domain")[0]["types"]
+                if domains is None:
+                    domains = set(self.domains)
+                for i in [x[TCONTEXT] for x in sesearch([ALLOW], {SCONTEXT: key[0], CLASS: key[1], PERMS: list(key[2])})]:
+                    if i not in domains:
+                        types.append(i)
+            except:
+                pass
+            self.write_targets[key] = types
+
     def __add_allow_rules(self, avs):
+        self.__lookup_write_targets(avs)
         for av in avs:
             rule = refpolicy.AVRule(av)
             if self.dontaudit:
@@ -179,23 +255,12 @@ class PolicyGenerator:
                 for reason in av.data[1:]:
                     rule.comment += "\n#\tPossible cause is the source %s and target %s are different." % reason
 
-            try:
-                if ( av.type == audit2why.TERULE and
-                     "write" in av.perms and
-                     ( "dir" in av.obj_class or "open" in av.perms )):
-                    if not self.domains:
-                        self.domains = seinfo(ATTRIBUTE, name="domain")[0]["types"]
-                    types=[]
-
-                    for i in [x[TCONTEXT] for x in sesearch([ALLOW], {SCONTEXT: av.src_type, CLASS: av.obj_class, PERMS: av.perms})]:
-                        if i not in self.domains:
-                            types.append(i)
-                    if len(types) == 1:
-                        rule.comment += "\n#!!!! The source type '%s' can write to a '%s' of the following type:\n# %s\n" % ( av.src_type, av.obj_class, ", ".join(types))
-                    elif len(types) >= 1:
-                        rule.comment += "\n#!!!! The source type '%s' can write to a '%s' of the following types:\n# %s\n" % ( av.src_type, av.obj_class, ", ".join(types))
-            except:
-                pass
+            if self.__wants_write_targets(av):
+                types = self.write_targets.get(self.__write_targets_key(av), [])
+                if len(types) == 1:
+                    rule.comment += "\n#!!!! The source type '%s' can write to a '%s' of the following type:\n# %s\n" % ( av.src_type, av.obj_class, ", ".join(types))
+                elif len(types) >= 1:
+                    rule.comment += "\n#!!!! The source type '%s' can write to a '%s' of the following types:\n# %s\n" % ( av.src_type, av.obj_class, ", ".join(types))
             self.module.children.append(rule)
 
 
@@ -221,6 +286,101 @@ class PolicyGenerator:
         for role_type in role_type_set:
             self.module.children.append(role_type)
 
+def fold_perms(perms, support_macros):
+    """Replace permissions with obj_perm_sets macros.
+
+    Return an IdSet in which the largest macros whose expansion is
+    contained in perms stand in for the permissions they cover. A
+    macro is only used if it covers at least two permissions that
+    are not already covered, and never grants anything not in perms.
+    """
+    remaining = set(perms)
+    folded = refpolicy.IdSet()
+    macros = [(x.name, support_macros.by_name(x.name)) for x in support_macros]
+    macros.sort(key=lambda x: (-len(x[1]), x[0]))
+    for name, expansion in macros:
+        if len(expansion & remaining) < 2:
+            continue
+        if not expansion.issubset(perms):
+            continue
+        folded.add(name)
+        remaining -= expansion
+    folded.update(remaining)
+    return folded
+
+def minimize_rules(rules, support_macros=None):
+    """Combine AV rules into as few rules as possible.
+
+    The access of the rules is first reduced to the permissions for
+    each (rule type, source, target, class). For each source, the
+    targets that are given the same permissions on a class are then
+    combined into one rule and those rules are combined across
+    classes, or the other way around - whichever gives fewer rules.
+    Rules are only combined with rules that have the same comment,
+    so explanations and warnings stay with the access they are for.
+
+    If support_macros is not None the permission sets are folded
+    into obj_perm_sets macros (see fold_perms).
+
+    Returns a list of new AVRules that allow the same access as the
+    rules passed in.
+    """
+    perms = { }
+    order = { }
+    for rule in rules:
+        comment = rule.comment or ""
+        for src in rule.src_types:
+            for tgt in rule.tgt_types:
+                for obj_class in rule.obj_classes:
+                    key = (rule.rule_type, comment, src, tgt, obj_class)
+                    perms.setdefault(key, set()).update(rule.perms)
+                    order.setdefault((rule.rule_type, comment, src), (len(order), rule.comment))
+
+    def group(first, second):
+        # first and second are the indexes in the (target, class)
+        # pair that are combined first and second.
+        by_first = { }
+        for (rule_type, comment, src, tgt, obj_class), p in perms.items():
+            pair = (tgt, obj_class)
+            key = (rule_type, comment, src, pair[second], frozenset(p))
+            by_first.setdefault(key, set()).add(pair[first])
+        by_second = { }
+        for (rule_type, comment, src, x, p), xs in by_first.items():
+            key = (rule_type, comment, src, frozenset(xs), p)
+            by_second.setdefault(key, set()).add(x)
+        l = []
+        for (rule_type, comment, src, xs, p), ys in by_second.items():
+            if first == 0:
+                l.append((rule_type, comment, src, xs, ys, p))
+            else:
+                l.append((rule_type, comment, src, ys, xs, p))
+        return l
+
+    grouped = group(0, 1)
+    by_class = group(1, 0)
+    if len(by_class) < len(grouped):
+        grouped = by_class
+
+    folded = { }
+    minimized = []
+    for rule_type, comment, src, tgts, classes, p in grouped:
+        rule = refpolicy.AVRule()
+        rule.rule_type = rule_type
+        rule.src_types.add(src)
+        rule.tgt_types.update(tgts)
+        rule.obj_classes.update(classes)
+        if support_macros is None:
+            rule.perms.update(p)
+        else:
+            if p not in folded:
+                folded[p] = fold_perms(p, support_macros)
+            rule.perms.update(folded[p])
+        pos, rule.comment = order[rule_type, comment, src]
+        minimized.append((pos, sorted(tgts), sorted(classes), rule))
+
+    minimized.sort(key=lambda x: x[:3])
+    return [x[3] for x in minimized]
+
 def explain_access(av, ml=None, verbosity=SHORT_EXPLANATION):
     """Explain why a policy statement was generated.
 
@@ -340,15 +500,19 @@ class InterfaceGenerator:
                 ifcall.comment = refpolicy.Comment(explain_access(ml.av, ml, verbosity))
             ifcalls.append((ifcall, ml))
 
+        # Drop duplicate calls, merging their comments into the first
+        # one seen. Calls are indexed by InterfaceCall.key so this is
+        # linear in the number of calls.
         d = []
+        by_key = { }
         for ifcall, ifs in ifcalls:
-            found = False
-            for o_ifcall in d:
-                if o_ifcall.matches(ifcall):
-                    if o_ifcall.comment and ifcall.comment:
-                        o_ifcall.comment.merge(ifcall.comment)
-                    found = True
-            if not found:
+            key = ifcall.key()
+            if key in by_key:
+                o_ifcall = by_key[key]
+                if o_ifcall.comment and ifcall.comment:
+                    o_ifcall.comment.merge(ifcall.comment)
+            else:
+                by_key[key] = ifcall
                 d.append(ifcall)
 
         return (raw_av, d)
@@ -356,13 +520,14 @@ class InterfaceGenerator:
 
     def match(self, avs):
         raw_av = []
-        for av in avs:
-            ans = matching.MatchList()
-            self.matcher.search_ifs(self.ifs, av, ans)
-            if len(ans):
-                self.calls.append(ans)
-            else:
-                raw_av.append(av)
+        with stats.phase("match"):
+            for av in avs:
+                ans = matching.MatchList()
+                self.matcher.search_ifs(self.ifs, av, ans)
+                if len(ans):
+                    self.calls.append(ans)
+                else:
+                    raw_av.append(av)
 
         return raw_av
 
@@ -1040,8 +1040,45 @@ def list_headers(root):
     return (modules, support_macros)
 
 
-def parse_headers(root, output=None, expand=True, debug=False):
+def parse_support_macros(root=None):
+    """Parse only the support macros (obj_perm_sets.spt) from the headers.
+
+    root defaults to the installed headers (defaults.headers()).
+    Returns a refpolicy.SupportMacros or None if the headers have no
+    support macros.
+    """
+    if root is None:
+        root = defaults.headers()
+    modules, support_macros = list_headers(root)
+    if not support_macros:
+        return None
+    fd = open(support_macros)
+    txt = fd.read()
+    fd.close()
+    spt = refpolicy.SupportMacros()
+    try:
+        parse(txt, spt)
+    except ValueError as e:
+        raise ValueError("error parsing file %s: %s" % (support_macros, str(e)))
+    return spt
+
+def parse_headers(root, output=None, expand=True, debug=False, snapshot=True):
+    """Parse the reference policy headers into a refpolicy.Headers tree.
+
+    root is either the headers directory or a single interface file
+    (in which case the support macros are taken from the default
+    headers directory).
+
+    Unless snapshot is False (or debug is set) a snapshot of the
+    parsed tree is looked up first - see sepolgen.snapshot. Snapshots
+    are keyed by the contents of every header file, so editing or
+    adding a header simply causes the headers to be parsed again. Each
+    root and expand setting has a snapshot of its own.
+    After a successful parse a new snapshot is stored if the data
+    directory is writable.
+    """
     from . import util
+    from . import snapshot as hsnapshot
 
     headers = refpolicy.Headers()
 
@@ -1065,6 +1102,23 @@ def parse_headers(root, output=None, expand=True, debug=False):
         if output:
             output.write(msg)
 
+    key = None
+    snapshot_name = hsnapshot.headers_name(root, expand)
+    if snapshot and not debug:
+        files = [x[1] for x in modules]
+        if support_macros:
+            files.append(support_macros)
+        try:
+            key = hsnapshot.headers_key(files, expand)
+        except IOError:
+            key = None
+        if key:
+            cached = hsnapshot.load(key, name=snapshot_name)
+            if cached is not None:
+                o("Loaded parsed headers from snapshot %s\n" %
+                  hsnapshot.snapshot_name(key, name=snapshot_name))
+                return cached
+
     def parse_file(f, module, spt=None):
         global parse_file
         if debug:
@@ -1124,5 +1178,8 @@ def parse_headers(root, output=None, expand=True, debug=False):
 
     if len(failures):
         o("failed to parse some headers: %s" % ", ".join(failures))
+    elif key:
+        # Only snapshot complete parses so failures keep being reported.
+        hsnapshot.save(headers, key, name=snapshot_name)
 
     return headers
@@ -763,15 +763,26 @@ class InterfaceCall(Leaf):
         self.args = []
         self.comments = []
 
+    def key(self):
+        """Return a hashable key identifying this interface call.
+
+        The key is the interface name plus the arguments. Arguments
+        that are lists (i.e., sets of identifiers) are sorted so that
+        calls differing only in the order of a set have the same key.
+        Two calls match (see matches) exactly when their keys are equal.
+        """
+        args = []
+        for a in self.args:
+            if isinstance(a, list):
+                l = list(a)
+                l.sort()
+                args.append(tuple(l))
+            else:
+                args.append(a)
+        return (self.ifname, tuple(args))
+
     def matches(self, other):
-        if self.ifname != other.ifname:
-            return False
-        if len(self.args) != len(other.args):
-            return False
-        for a,b in zip(self.args, other.args):
-            if a != b:
-                return False
-        return True
+        return self.key() == other.key()
 
     def to_string(self):
         s = "%s(" % self.ifname
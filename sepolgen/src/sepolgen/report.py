@@ -0,0 +1,169 @@
+# Copyright (C) 2006-2007 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; version 2 only
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Aggregated reports of denials.
+
+Logs commonly repeat the same denial many times. A DenialReport
+groups AVC messages by source and target context, class, permissions
+and the verdict of the policy analysis (see audit.AVCMessage.analyze)
+and keeps only a count, the first and last time the denial was seen
+and a few samples of the processes and paths involved for each group.
+Messages are added one at a time so a report can be built while the
+log is read - a report can be passed to audit.AuditParser as its
+avc_sink.
+"""
+
+import json
+import time
+
+from .audit import message_time
+
+import selinux.audit2why as audit2why
+
+# Descriptions of the audit2why verdicts.
+verdicts = {
+    audit2why.ALLOW : "allowed by the active policy",
+    audit2why.DONTAUDIT : "dontaudit'd by the active policy",
+    audit2why.TERULE : "missing type enforcement (TE) allow rule",
+    audit2why.BOOLEAN : "boolean set incorrectly",
+    audit2why.CONSTRAINT : "constraint violation",
+    audit2why.RBAC : "missing role allow rule",
+}
+
+class DenialGroup:
+    """All of the AVC messages for one denial.
+
+    .samples maps "comm", "exe" and "path" to the distinct values seen,
+    in the order they were first seen, up to the report's max_samples.
+    """
+    def __init__(self, key, avc):
+        self.scontext, self.tcontext, self.tclass, self.perms, self.verdict = key
+        self.count = 0
+        self.first = None
+        self.last = None
+        self.samples = { "comm" : [], "exe" : [], "path" : [] }
+        self.booleans = []
+        self.constraint = ""
+        if self.verdict == audit2why.BOOLEAN:
+            self.booleans = [(x[0], x[1]) for x in avc.data]
+        elif self.verdict == audit2why.CONSTRAINT and avc.data:
+            self.constraint = avc.data[0]
+
+    def add(self, avc, max_samples):
+        self.count += 1
+        t = message_time(avc)
+        if t is not None:
+            if self.first is None or t < self.first:
+                self.first = t
+            if self.last is None or t > self.last:
+                self.last = t
+        for name, value in (("comm", avc.comm), ("exe", avc.exe),
+                            ("path", avc.path or avc.name)):
+            l = self.samples[name]
+            if value and len(l) < max_samples and value not in l:
+                l.append(value)
+
+    def to_dict(self):
+        return { "scontext" : self.scontext,
+                 "tcontext" : self.tcontext,
+                 "tclass" : self.tclass,
+                 "perms" : list(self.perms),
+                 "verdict" : verdicts.get(self.verdict, str(self.verdict)),
+                 "count" : self.count,
+                 "first_seen" : self.first,
+                 "last_seen" : self.last,
+                 "samples" : self.samples,
+                 "booleans" : [{ "name" : b, "value" : v } for b, v in self.booleans],
+                 "constraint" : self.constraint }
+
+def _format_time(t):
+    if t is None:
+        return "unknown"
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))
+
+class DenialReport:
+    """Denials grouped by (scontext, tcontext, tclass, perms, verdict).
+
+    If an avc_filter is passed in, only the messages it accepts are
+    added (e.g., audit.DenialFilter to leave out granted messages).
+    """
+    def __init__(self, max_samples=5, avc_filter=None):
+        self.max_samples = max_samples
+        self.avc_filter = avc_filter
+        self.clear()
+
+    def clear(self):
+        self.groups = { }
+        self.total = 0
+
+    def add(self, avc):
+        if self.avc_filter and not self.avc_filter.filter(avc):
+            return
+        key = (avc.scontext.to_string(), avc.tcontext.to_string(), avc.tclass,
+               tuple(sorted(avc.accesses)), avc.type)
+        group = self.groups.get(key)
+        if group is None:
+            group = DenialGroup(key, avc)
+            self.groups[key] = group
+        group.add(avc, self.max_samples)
+        self.total += 1
+
+    def add_msgs(self, avcs):
+        for avc in avcs:
+            self.add(avc)
+
+    def sorted_groups(self, top=None):
+        """Return the groups, most frequent first, optionally only the
+        first top of them."""
+        groups = sorted(self.groups.values(),
+                        key=lambda g: (-g.count, g.first or 0, g.scontext,
+                                       g.tcontext, g.tclass, g.perms))
+        if top is not None:
+            groups = groups[:top]
+        return groups
+
+    def to_dict(self, top=None):
+        return { "total" : self.total,
+                 "unique" : len(self.groups),
+                 "groups" : [g.to_dict() for g in self.sorted_groups(top)] }
+
+    def to_string(self, top=None):
+        lines = ["%d denials, %d unique" % (self.total, len(self.groups))]
+        for g in self.sorted_groups(top):
+            lines.append("")
+            lines.append("%d x %s %s:%s { %s }" % (g.count, g.scontext, g.tcontext,
+                                                   g.tclass, " ".join(g.perms)))
+            lines.append("\tverdict: %s" % verdicts.get(g.verdict, g.verdict))
+            lines.append("\tfirst seen: %s  last seen: %s" % (_format_time(g.first),
+                                                              _format_time(g.last)))
+            for name in ("comm", "exe", "path"):
+                if g.samples[name]:
+                    lines.append("\t%s: %s" % (name, ", ".join(g.samples[name])))
+            for b, v in g.booleans:
+                lines.append("\tfix: setsebool -P %s %d" % (b, v))
+            if g.constraint:
+                lines.append("\tconstraint: %s" % g.constraint)
+        return "\n".join(lines) + "\n"
+
+    def to_file(self, fd, format="text", top=None):
+        """Write the report to a file object as text or JSON."""
+        if format == "json":
+            json.dump(self.to_dict(top), fd, sort_keys=True)
+            fd.write("\n")
+        else:
+            fd.write(self.to_string(top))
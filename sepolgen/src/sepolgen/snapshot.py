@@ -0,0 +1,294 @@
+# Copyright (C) 2006-2007 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; version 2 only
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+On-disk snapshots of parsed reference policy headers.
+
+Parsing the reference policy headers (see refparser.parse_headers) is
+by far the most expensive step of interface generation. This module
+stores a parsed refpolicy.Headers tree in a compact, versioned file
+that can be read back much faster than the headers can be parsed.
+
+Snapshots are plain JSON - no code is ever run while loading one and
+only classes from sepolgen.refpolicy can be instantiated. Each
+snapshot is keyed by a hash of the header files it was made from and
+of the parser itself (see headers_key), so a stale snapshot is simply
+never found rather than silently reused.
+
+Snapshots of different header sets (e.g., the installed headers, a
+single interface file or an unexpanded parse) are stored side by side
+under different names (see headers_name). Only the latest snapshot
+for each name is kept - the older ones are removed when a new one is
+saved.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from . import defaults
+from . import refpolicy
+from . import util
+
+# Bump this whenever the encoding below changes.
+SNAPSHOT_VERSION = 1
+
+MAGIC = "sepolgen-headers-snapshot"
+
+# Derived caches that are rebuilt on demand and are not worth storing.
+_skip_attrs = { "parent" : True, "map" : True }
+
+def _module_digest():
+    # The parser and the tree classes determine the shape of the
+    # snapshot, so any change to them must invalidate old snapshots.
+    h = hashlib.sha256()
+    srcdir = os.path.dirname(os.path.abspath(__file__))
+    for name in ("refparser.py", "refpolicy.py"):
+        fn = os.path.join(srcdir, name)
+        try:
+            fd = open(fn, "rb")
+            h.update(fd.read())
+            fd.close()
+        except IOError:
+            h.update(fn.encode("utf-8"))
+    return h.hexdigest()
+
+def headers_key(filenames, expand=True):
+    """Return the snapshot key for a set of header files.
+
+    The key is a hex digest covering the snapshot format version,
+    the parser source, the expand setting passed to parse_headers
+    and the name and contents of every file in filenames.
+
+    Raises IOError if one of the files cannot be read.
+    """
+    h = hashlib.sha256()
+    h.update(("%s %d %s %s\n" % (MAGIC, SNAPSHOT_VERSION, _module_digest(),
+                                 bool(expand))).encode("utf-8"))
+    for fn in sorted(filenames):
+        fd = open(fn, "rb")
+        data = fd.read()
+        fd.close()
+        h.update(fn.encode("utf-8") + b"\0")
+        h.update(hashlib.sha256(data).digest())
+    return h.hexdigest()
+
+def headers_name(root=None, expand=True):
+    """Return the name snapshots of the headers under root are stored
+    under.
+
+    root is the headers directory or interface file passed to
+    parse_headers and defaults to the installed headers
+    (defaults.headers()).
+    """
+    if root is None:
+        root = defaults.headers()
+    h = hashlib.sha256(("%s %s" % (os.path.abspath(root), bool(expand))).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def snapshot_name(key, dirname=None, name=None):
+    """Return the file name used to store the snapshot for key.
+
+    name defaults to the name of the installed headers (see
+    headers_name).
+    """
+    if dirname is None:
+        dirname = defaults.headers_snapshot_dir()
+    if name is None:
+        name = headers_name()
+    return os.path.join(dirname, "%s-%s.json" % (name, key))
+
+# Encoding
+#
+# Strings, numbers, booleans, None and lists are stored as themselves.
+# Everything else becomes a single key JSON object:
+#   {"o": [class name, {attr: value}, parented]} - refpolicy objects
+#   {"i": [[ids], compliment]} - IdSet
+#   {"s": [items]} - set
+#   {"t": [items]} - tuple (e.g., the (val, stmt) children of ifdefs)
+#   {"d": [[key, value]]} - dict
+
+def _encode(v, parent=None):
+    if v is None or isinstance(v, (bool, int, float)):
+        return v
+    if isinstance(v, (util.string_type, util.bytes_type)):
+        return v
+    if isinstance(v, list):
+        return [_encode(x, parent) for x in v]
+    if isinstance(v, tuple):
+        return { "t" : [_encode(x, parent) for x in v] }
+    if isinstance(v, refpolicy.IdSet):
+        return { "i" : [sorted(v), v.compliment] }
+    if isinstance(v, (set, frozenset)):
+        return { "s" : [_encode(x) for x in sorted(v)] }
+    if isinstance(v, dict):
+        return { "d" : [[_encode(k), _encode(x)] for k, x in v.items()] }
+
+    name = v.__class__.__name__
+    if getattr(refpolicy, name, None) is not v.__class__:
+        raise ValueError("cannot snapshot object of type %s" % name)
+    attrs = { }
+    for attr, x in v.__dict__.items():
+        if attr in _skip_attrs:
+            continue
+        attrs[attr] = _encode(x, v)
+    parented = parent is not None and getattr(v, "parent", None) is parent
+    return { "o" : [name, attrs, parented] }
+
+def _decode(v, parent=None):
+    if isinstance(v, list):
+        return [_decode(x, parent) for x in v]
+    if not isinstance(v, dict):
+        return v
+    if len(v) != 1:
+        raise ValueError("invalid snapshot entry")
+    tag, x = list(v.items())[0]
+    if tag == "t":
+        return tuple([_decode(y, parent) for y in x])
+    if tag == "i":
+        s = refpolicy.IdSet(x[0])
+        s.compliment = x[1]
+        return s
+    if tag == "s":
+        return set([_decode(y) for y in x])
+    if tag == "d":
+        return dict([(_decode(k), _decode(y)) for k, y in x])
+    if tag != "o":
+        raise ValueError("invalid snapshot entry tag %s" % tag)
+
+    name, attrs, parented = x
+    cls = getattr(refpolicy, name, None)
+    if isinstance(cls, type):
+        obj = cls.__new__(cls)
+    elif type(cls).__name__ == "classobj":
+        # old style classes on python 2
+        import types
+        obj = types.InstanceType(cls)
+    else:
+        raise ValueError("invalid snapshot object type %s" % name)
+    if isinstance(obj, refpolicy.PolicyBase):
+        obj.parent = None
+    if isinstance(obj, refpolicy.SupportMacros):
+        obj.map = None
+    for attr, y in attrs.items():
+        setattr(obj, attr, _decode(y, obj))
+    if parented:
+        obj.parent = parent
+    return obj
+
+def to_file(headers, fd, key=""):
+    """Write a snapshot of a parsed headers tree to a file object.
+
+    The first line holds the format version and key; the rest of the
+    file is the encoded tree.
+    """
+    fd.write("%s %d %s\n" % (MAGIC, SNAPSHOT_VERSION, key))
+    json.dump(_encode(headers), fd, separators=(",", ":"))
+    fd.write("\n")
+
+def from_file(fd, key=None):
+    """Read a snapshot written by to_file and return the headers tree.
+
+    If key is not None the snapshot must have been written with the
+    same key. Raises ValueError if the snapshot is from a different
+    format version, has a different key, or is corrupt.
+    """
+    fields = fd.readline().split()
+    if len(fields) < 2 or fields[0] != MAGIC:
+        raise ValueError("not a sepolgen headers snapshot")
+    if fields[1] != str(SNAPSHOT_VERSION):
+        raise ValueError("unsupported snapshot version %s" % fields[1])
+    if len(fields) > 2:
+        stored_key = fields[2]
+    else:
+        stored_key = ""
+    if key is not None and stored_key != key:
+        raise ValueError("snapshot key does not match")
+    headers = _decode(json.load(fd))
+    if not isinstance(headers, refpolicy.Headers):
+        raise ValueError("snapshot does not contain a headers tree")
+    return headers
+
+def load(key, dirname=None, name=None):
+    """Return the headers tree stored for key or None if there is
+    no usable snapshot."""
+    try:
+        fd = open(snapshot_name(key, dirname, name))
+    except IOError:
+        return None
+    try:
+        try:
+            return from_file(fd, key)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return None
+    finally:
+        fd.close()
+
+def prune(key, dirname=None, name=None):
+    """Remove the snapshots in dirname stored under the same name as
+    the one for key, other than that one. Snapshots stored under other
+    names are kept."""
+    if name is None:
+        name = headers_name()
+    fn = snapshot_name(key, dirname, name)
+    dirname, basename = os.path.split(fn)
+    snapshot_re = re.compile(r"^%s-[0-9a-f]{64}\.json$" % re.escape(name))
+    try:
+        files = os.listdir(dirname)
+    except OSError:
+        return
+    for f in files:
+        if snapshot_re.match(f) and f != basename:
+            try:
+                os.unlink(os.path.join(dirname, f))
+            except OSError:
+                pass
+
+def save(headers, key, dirname=None, name=None):
+    """Store a snapshot of headers for key under name.
+
+    The snapshot is written to a temporary file and renamed into
+    place so concurrent readers never see a partial file. The older
+    snapshots stored under the same name are then removed, as they
+    are for headers that have since changed (see prune). Failure to write
+    (e.g., an unprivileged user and the system data directory) is
+    not an error - False is returned and the caller just parses the
+    headers again next time.
+    """
+    fn = snapshot_name(key, dirname, name)
+    dirname = os.path.dirname(fn)
+    try:
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        tmpfd, tmpname = tempfile.mkstemp(dir=dirname, prefix=".snapshot")
+    except (IOError, OSError):
+        return False
+    try:
+        fd = os.fdopen(tmpfd, "w")
+        to_file(headers, fd, key)
+        fd.close()
+        os.rename(tmpname, fn)
+    except (IOError, OSError, ValueError):
+        try:
+            os.unlink(tmpname)
+        except OSError:
+            pass
+        return False
+    prune(key, dirname, name)
+    return True
@@ -0,0 +1,169 @@
+# Copyright (C) 2006-2007 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; version 2 only
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Timing and counters for the policy generation pipeline.
+
+The sepolgen modules record the time spent in their expensive steps
+(e.g., audit2why analysis and interface matching) and count the work
+they do in the module level Stats instance, stats. Nothing is
+recorded there until a caller sets stats.enabled (e.g., audit2allow
+--stats), so the hot paths pay nothing otherwise. Callers can add
+their own phases and counters, read the results with Stats.to_dict
+and reset them with Stats.reset:
+
+    from sepolgen.stats import stats
+    stats.enabled = True
+    with stats.phase("read_input"):
+        parser.parse_file(f)
+    print(stats.to_dict()["counters"]["lines"])
+
+Phases may nest - the time of a phase includes the time of the
+phases run inside it.
+"""
+
+import json
+import os
+import time
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def cpu_time():
+    """Return the user + system CPU time used by this process."""
+    t = os.times()
+    return t[0] + t[1]
+
+def peak_rss():
+    """Return the peak resident set size of this process in KiB or
+    None if it is not available."""
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+class PhaseTimer:
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.time()
+        self.cpu = cpu_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stats.add_time(self.name, time.time() - self.wall,
+                            cpu_time() - self.cpu)
+        return False
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+_null_timer = NullTimer()
+
+class Stats:
+    """Per-phase times and named counters.
+
+    Each phase records the number of times it ran and the total wall
+    and CPU time in seconds. Counters are integers. Nothing is
+    recorded while .enabled is False.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.phases = { }
+        self.phase_order = []
+        self.counters = { }
+
+    def phase(self, name):
+        """Return a context manager that times a phase."""
+        if not self.enabled:
+            return _null_timer
+        return PhaseTimer(self, name)
+
+    def add_time(self, name, wall, cpu):
+        p = self.phases.get(name)
+        if p is None:
+            p = [0, 0.0, 0.0]
+            self.phases[name] = p
+            self.phase_order.append(name)
+        p[0] += 1
+        p[1] += wall
+        p[2] += cpu
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def rates(self):
+        """Return the derived rates that can be computed from the
+        recorded phases and counters."""
+        r = { }
+        lines = self.counters.get("lines")
+        if lines is not None and "read_input" in self.phases:
+            wall = self.phases["read_input"][1]
+            if wall > 0:
+                r["lines_per_sec"] = lines / wall
+        hits = self.counters.get("avcdict_hits", 0)
+        misses = self.counters.get("avcdict_misses", 0)
+        if hits + misses:
+            r["avcdict_hit_rate"] = hits / float(hits + misses)
+        return r
+
+    def to_dict(self):
+        phases = [ ]
+        for name in self.phase_order:
+            calls, wall, cpu = self.phases[name]
+            phases.append({ "name" : name, "calls" : calls,
+                            "wall" : wall, "cpu" : cpu })
+        return { "phases" : phases,
+                 "counters" : dict(self.counters),
+                 "rates" : self.rates(),
+                 "peak_rss_kb" : peak_rss() }
+
+    def to_string(self):
+        d = self.to_dict()
+        lines = ["%-20s %8s %10s %10s" % ("phase", "calls", "wall (s)", "cpu (s)")]
+        for p in d["phases"]:
+            lines.append("%-20s %8d %10.3f %10.3f" % (p["name"], p["calls"],
+                                                       p["wall"], p["cpu"]))
+        for name in sorted(d["counters"]):
+            lines.append("%-20s %8d" % (name, d["counters"][name]))
+        for name in sorted(d["rates"]):
+            lines.append("%-20s %8.2f" % (name, d["rates"][name]))
+        if d["peak_rss_kb"] is not None:
+            lines.append("%-20s %8d KiB" % ("peak_rss", d["peak_rss_kb"]))
+        return "\n".join(lines) + "\n"
+
+    def to_file(self, fd, format="text"):
+        """Write the statistics to a file object as text or JSON."""
+        if format == "json":
+            json.dump(self.to_dict(), fd, sort_keys=True)
+            fd.write("\n")
+        else:
+            fd.write(self.to_string())
+
+stats = Stats(enabled=False)
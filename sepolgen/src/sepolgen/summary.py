@@ -0,0 +1,173 @@
+# Copyright (C) 2006-2007 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; version 2 only
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Mergeable summaries of the access denied on many hosts.
+
+A Summary is the compact form of a parsed audit log: the denied
+access (as from AuditParser.to_access) with the number of messages
+and the hosts that reported each access vector. Summaries are built
+per host - possibly on the host itself - and then merged. Merging is
+associative and commutative, so shards can be combined in any order
+or grouping, and policy can be generated for a whole fleet from the
+merged summary instead of from the concatenated logs.
+
+Summaries are stored as JSON (see to_file / from_file).
+"""
+
+import json
+
+from . import access
+from . import refpolicy
+
+import selinux.audit2why as audit2why
+
+SUMMARY_VERSION = 1
+
+MAGIC = "sepolgen-denial-summary"
+
+class SummaryEntry:
+    """The merged access for one (source, target, class, verdict)."""
+    def __init__(self):
+        self.perms = refpolicy.IdSet()
+        self.count = 0
+        self.hosts = set()
+        self.data = []
+
+class Summary:
+    def __init__(self):
+        # (src_type, tgt_type, obj_class, avc_type) -> SummaryEntry
+        self.entries = { }
+        # (role, type) -> set of hosts
+        self.role_types = { }
+        self.hosts = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, src_type, tgt_type, obj_class, perms, count=1, hosts=(),
+            avc_type=audit2why.TERULE, data=[]):
+        """Add access seen count times on hosts to the summary."""
+        key = (src_type, tgt_type, obj_class, avc_type)
+        e = self.entries.get(key)
+        if e is None:
+            e = SummaryEntry()
+            self.entries[key] = e
+        e.perms.update(perms)
+        e.count += count
+        e.hosts.update(hosts)
+        if data and not e.data:
+            e.data = data
+        self.hosts.update(hosts)
+
+    def add_access(self, avs, host=None):
+        """Add the access in an access vector set, e.g., from
+        AuditParser.to_access, reported by host."""
+        if host is None:
+            hosts = ()
+        else:
+            hosts = (host,)
+        for av in avs:
+            self.add(av.src_type, av.tgt_type, av.obj_class, av.perms,
+                     max(1, len(av.audit_msgs)), hosts, av.type, av.data)
+
+    def add_role_types(self, role_types, host=None):
+        for role_type in role_types:
+            for t in role_type.types:
+                hosts = self.role_types.setdefault((role_type.role, t), set())
+                if host is not None:
+                    hosts.add(host)
+                    self.hosts.add(host)
+
+    def merge(self, other):
+        """Merge another summary into this one and return this one."""
+        for (src, tgt, obj_class, avc_type), e in other.entries.items():
+            self.add(src, tgt, obj_class, e.perms, e.count, e.hosts,
+                     avc_type, e.data)
+        for key, hosts in other.role_types.items():
+            self.role_types.setdefault(key, set()).update(hosts)
+        self.hosts.update(other.hosts)
+        return self
+
+    def to_access(self):
+        """Return the summarized access as an access vector set."""
+        avs = access.AccessVectorSet()
+        for (src, tgt, obj_class, avc_type), e in self.entries.items():
+            avs.add(src, tgt, obj_class, e.perms, avc_type=avc_type, data=e.data)
+        return avs
+
+    def to_role(self):
+        role_types = access.RoleTypeSet()
+        for role, t in self.role_types:
+            role_types.add(role, t)
+        return role_types
+
+    def to_dict(self):
+        entries = []
+        for key in sorted(self.entries):
+            e = self.entries[key]
+            entries.append(list(key) + [sorted(e.perms), e.count,
+                                        sorted(e.hosts), e.data])
+        role_types = []
+        for key in sorted(self.role_types):
+            role_types.append(list(key) + [sorted(self.role_types[key])])
+        return { "magic" : MAGIC,
+                 "version" : SUMMARY_VERSION,
+                 "hosts" : sorted(self.hosts),
+                 "access" : entries,
+                 "role_types" : role_types }
+
+    def from_dict(self, d):
+        """Merge a summary stored with to_dict into this one.
+
+        Raises ValueError if d is not a summary of this version."""
+        if d.get("magic") != MAGIC:
+            raise ValueError("not a sepolgen denial summary")
+        if d.get("version") != SUMMARY_VERSION:
+            raise ValueError("unsupported summary version %s" % d.get("version"))
+        for src, tgt, obj_class, avc_type, perms, count, hosts, data in d["access"]:
+            # JSON has no tuples - the audit2why data is lists of tuples.
+            data = [tuple(x) if isinstance(x, list) else x for x in data]
+            self.add(src, tgt, obj_class, perms, count, hosts, avc_type, data)
+        for role, t, hosts in d["role_types"]:
+            self.role_types.setdefault((role, t), set()).update(hosts)
+        self.hosts.update(d["hosts"])
+
+    def to_file(self, fd):
+        json.dump(self.to_dict(), fd, sort_keys=True)
+        fd.write("\n")
+
+    def from_file(self, fd):
+        try:
+            d = json.load(fd)
+        except ValueError:
+            raise ValueError("summary is not valid JSON")
+        self.from_dict(d)
+
+def from_parser(parser, host=None, avc_filter=None):
+    """Return the summary of the denials parsed by an AuditParser."""
+    s = Summary()
+    s.add_access(parser.to_access(avc_filter), host)
+    s.add_role_types(parser.to_role(), host)
+    return s
+
+def merge(summaries):
+    """Merge summaries into a new summary."""
+    s = Summary()
+    for x in summaries:
+        s.merge(x)
+    return s
@@ -11,6 +11,11 @@ from test_matching import *
 from test_interfaces import *
 from test_objectmodel import *
 from test_module import *
+from test_output import *
+from test_snapshot import *
+from test_stats import *
+from test_report import *
+from test_summary import *
 
 if __name__ == "__main__":
     unittest.main()
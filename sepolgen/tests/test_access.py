@@ -260,3 +260,29 @@ class TestAccessVectorSet(unittest.TestCase):
         b = access.AccessVectorSet()
         b.from_list(avl)
         self.assertEqual(len(b), 3)
+
+    def test_split_by_src(self):
+        parts = self.s.split_by_src()
+        self.assertEqual(sorted(parts.keys()), ["baz", "foo"])
+        for src, avs in parts.items():
+            self.assertEqual(len(avs), 4)
+            for av in avs:
+                self.assertEqual(av.src_type, src)
+
+    def test_difference(self):
+        a = access.AccessVectorSet()
+        a.add("foo", "bar", "file", ["read", "write", "getattr"])
+        a.add("foo", "foo", "process", ["signal", "fork"])
+        a.add("foo", "baz", "dir", ["search"])
+
+        b = access.AccessVectorSet()
+        b.add("foo", "bar", "file", ["read", "getattr"])
+        b.add("foo", "self", "process", ["signal", "fork"])
+        b.add("foo", "baz", "file", ["search"])
+
+        d = a.difference(b)
+        l = d.to_list()
+        l.sort()
+        self.assertEqual(l, [["foo", "bar", "file", "write"],
+                             ["foo", "baz", "dir", "search"]])
+        self.assertEqual(len(b.difference(b)), 0)
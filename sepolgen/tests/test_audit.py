@@ -20,6 +20,7 @@
 import unittest
 import sepolgen.audit
 import sepolgen.refpolicy
+from sepolgen.stats import stats
 
 # syslog message
 audit1 = """Sep 12 08:26:43 dhcp83-5 kernel: audit(1158064002.046:4): avc:  denied  { read } for  pid=2 496 comm="bluez-pin" name=".gdm1K3IFT" dev=dm-0 ino=3601333 scontext=user_u:system_r:bluetooth_helper_t:s0-s0:c0 tcontext=system_u:object_r:xdm_tmp_t:s0 tclass=file"""
@@ -172,6 +173,23 @@ class TestAuditParser(unittest.TestCase):
         self.assertEqual(len(a.invalid_msgs), 0)
         self.assertEqual(len(a.policy_load_msgs), 0)
 
+    def test_parse_lines(self):
+        f = open("audit.txt")
+        a = sepolgen.audit.AuditParser()
+        a.parse_lines(f)
+        f.close()
+        self.assertEqual(len(a.avc_msgs), 21)
+
+        a = sepolgen.audit.AuditParser()
+        a.parse_lines([x + "\n" for x in log2.split("\n")])
+        self.assertEqual(len(a.avc_msgs), 2)
+        self.assertEqual(a.avc_msgs[0].path, "/usr/lib/sa/sa1")
+
+        # No audit messages is not an error.
+        a = sepolgen.audit.AuditParser()
+        a.parse_lines(["not an audit message\n"])
+        self.assertEqual(len(a.avc_msgs), 0)
+
 class TestGeneration(unittest.TestCase):
     def test_generation(self):
         parser = sepolgen.audit.AuditParser()
@@ -191,3 +209,61 @@ class TestGeneration(unittest.TestCase):
         
         self.assertEqual(len(avs), 1)
 
+
+    def test_missing_access_filter(self):
+        parser = sepolgen.audit.AuditParser()
+        parser.parse_string(log2)
+        for avc in parser.avc_msgs:
+            if "execute" in avc.accesses:
+                avc.type = sepolgen.audit.audit2why.ALLOW
+
+        avs = parser.to_access(sepolgen.audit.MissingAccessFilter())
+        self.assertEqual(len(avs), 1)
+        for av in avs:
+            self.assertEqual(av.perms, sepolgen.refpolicy.IdSet(["execute_no_trans"]))
+
+        f = sepolgen.audit.MissingAccessFilter(sepolgen.audit.AVCTypeFilter("foo_t"))
+        self.assertEqual(len(parser.to_access(f)), 0)
+
+class TestMessageFilter(unittest.TestCase):
+    def parse(self, expressions, log=log1):
+        parser = sepolgen.audit.AuditParser(msg_filter=sepolgen.audit.MessageFilter(expressions))
+        parser.parse_string(log)
+        return parser.avc_msgs
+
+    def test_fields(self):
+        self.assertEqual(len(self.parse([])), 11)
+        self.assertEqual(len(self.parse(["type=vpnc"])), 11)
+        self.assertEqual(len(self.parse(["type=foo_t"])), 0)
+        self.assertEqual(len(self.parse(["source!=vpnc_t"])), 0)
+        self.assertEqual(len(self.parse(["class=capability", "perm=dac_override"])), 5)
+        self.assertEqual(len(self.parse(["perm!=dac_override"])), 6)
+        self.assertEqual(len(self.parse(["comm=sh$"])), 3)
+        self.assertEqual(len(self.parse(["comm=sh$", "comm=vpnc"])), 11)
+        self.assertEqual(len(self.parse(["comm!=vpnc"])), 3)
+        self.assertEqual(len(self.parse(["target=lib_t", "exe=/bin/bash"], log2)), 0)
+        self.assertEqual(len(self.parse(["target=lib_t"], log2)), 2)
+
+    def test_time(self):
+        self.assertEqual(len(self.parse(["since=1158584780"])), 6)
+        self.assertEqual(len(self.parse(["since=1158584780", "until=1158584780.797"])), 4)
+        self.assertEqual(len(self.parse(["until=1158584779"])), 0)
+
+    def test_invalid(self):
+        f = sepolgen.audit.MessageFilter()
+        self.assertRaises(ValueError, f.add_expression, "foo=bar")
+        self.assertRaises(ValueError, f.add_expression, "type")
+        self.assertRaises(ValueError, f.add_expression, "type=(")
+        self.assertRaises(ValueError, f.add_expression, "since=yesterday")
+
+    def test_filtered_before_analyze(self):
+        sepolgen.audit.avcdict.clear()
+        stats.reset()
+        stats.enabled = True
+        try:
+            self.parse(["perm=dac_override"])
+        finally:
+            stats.enabled = False
+        self.assertEqual(stats.counters["avcdict_misses"], 1)
+        self.assertEqual(stats.counters["avcdict_hits"], 4)
+        self.assertEqual(stats.counters["filtered_msgs"], 6)
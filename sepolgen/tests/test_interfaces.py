@@ -257,6 +257,30 @@ class TestInterfaceSet(unittest.TestCase):
                 self.assertTrue(compare_avsets(comp_avs, interface.access))
                 
         
+    def test_ifcall_access(self):
+        h = refparser.parse(test_expansion)
+        i = interfaces.InterfaceSet()
+        i.add_headers(h)
+
+        ifcall = refpolicy.InterfaceCall("map")
+        ifcall.args = ["foo_t", ["bar_t", "baz_t"]]
+        comp_avs = [["bar_t", "usr_t", "dir", "create", "add_name"],
+                    ["bar_t", "usr_t", "file", "read", "write"],
+                    ["baz_t", "usr_t", "dir", "create", "add_name"],
+                    ["baz_t", "usr_t", "file", "read", "write"],
+                    ["foo_t", "bar_t", "file", "read"],
+                    ["bar_t", "bar_t", "file", "write"],
+                    ["baz_t", "bar_t", "file", "write"]]
+        self.assertTrue(compare_avsets(comp_avs, i.ifcall_access(ifcall)))
+
+        # The access of a missing parameter is left out.
+        ifcall.args = ["foo_t"]
+        self.assertTrue(compare_avsets([["foo_t", "bar_t", "file", "read"]],
+                                       i.ifcall_access(ifcall)))
+
+        ifcall.ifname = "unknown"
+        self.assertEqual(len(i.ifcall_access(ifcall)), 0)
+
     def test_export(self):
         h = refparser.parse(interface_example)
         i = interfaces.InterfaceSet()
@@ -281,3 +305,20 @@ class TestInterfaceSet(unittest.TestCase):
         self.assertEqual(if_status[0], True)
         self.assertEqual(if_status[1], True)
         self.assertEqual(if_status[2], True)
+
+class TestAttributeSet(unittest.TestCase):
+    def test_from_rules(self):
+        rules = [("files_type", "etc_t", "file", ["read", "getattr"]),
+                 ("foo_t", "etc_t", "file", ["write"]),
+                 ("files_type", "etc_t", "file", ["open"]),
+                 ("domain", "proc_t", "dir", ["search"])]
+        a = interfaces.AttributeSet()
+        a.from_rules(["files_type", "domain", "empty_attr"], rules)
+
+        self.assertEqual(sorted(a.attributes.keys()),
+                         ["domain", "empty_attr", "files_type"])
+        self.assertEqual(len(a.attributes["empty_attr"].access), 0)
+        self.assertTrue(compare_avsets([["files_type", "etc_t", "file", "getattr", "open", "read"]],
+                                       a.attributes["files_type"].access))
+        self.assertTrue(compare_avsets([["domain", "proc_t", "dir", "search"]],
+                                       a.attributes["domain"].access))
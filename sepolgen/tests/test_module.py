@@ -20,6 +20,8 @@
 import unittest
 import sepolgen.module as module
 import os
+import shutil
+import tempfile
 
 class TestModuleCompiler(unittest.TestCase):
     def test(self):
@@ -33,3 +35,158 @@ class TestModuleCompiler(unittest.TestCase):
         mc.create_module_package("module_compile_test.te", refpolicy=False)
         os.stat(package)
         os.unlink(package)
+
+class TestModulePackages(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        # Fake build tools that log each invocation and write their
+        # output file.
+        self.log = os.path.join(self.dir, "log")
+        self.tool = os.path.join(self.dir, "tool")
+        fd = open(self.tool, "w")
+        fd.write("#!/bin/sh\necho \"$@\" >> %s\n"
+                 "while [ $# -gt 0 ]; do if [ \"$1\" = -o ]; then echo pkg > \"$2\"; fi; shift; done\n" % self.log)
+        fd.close()
+        os.chmod(self.tool, 0o755)
+
+        self.mc = module.ModuleCompiler()
+        self.mc.checkmodule = self.tool
+        self.mc.semodule_package = self.tool
+        self.mc.cache_dir = os.path.join(self.dir, "cache")
+        self.mc.jobs = 4
+
+        self.sources = []
+        for i in range(6):
+            fn = os.path.join(self.dir, "mod%d.te" % i)
+            fd = open(fn, "w")
+            fd.write("module mod%d 1.0;\n" % i)
+            fd.close()
+            self.sources.append(fn)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def runs(self):
+        if not os.path.exists(self.log):
+            return 0
+        fd = open(self.log)
+        n = len(fd.readlines())
+        fd.close()
+        return n
+
+    def test_cache(self):
+        ret = self.mc.create_module_packages(self.sources, refpolicy=False)
+        self.assertEqual([x[0] for x in ret], self.sources)
+        for sourcename, packagename, cached in ret:
+            self.assertFalse(cached)
+            os.stat(packagename)
+            os.unlink(packagename)
+        self.assertEqual(self.runs(), 12)
+
+        # Unchanged modules come from the cache.
+        fd = open(self.sources[0], "a")
+        fd.write("type foo_t;\n")
+        fd.close()
+        ret = self.mc.create_module_packages(self.sources, refpolicy=False)
+        self.assertEqual([x[2] for x in ret], [False] + [True] * 5)
+        for sourcename, packagename, cached in ret:
+            os.stat(packagename)
+        self.assertEqual(self.runs(), 14)
+
+    def test_cache_size(self):
+        # Only the most recently used packages are kept.
+        self.mc.cache_size = 3
+        self.mc.create_module_packages(self.sources, refpolicy=False)
+        cached = [x for x in os.listdir(self.mc.cache_dir) if x.endswith(".pp")]
+        self.assertEqual(len(cached), 3)
+
+    def test_failure(self):
+        self.mc.semodule_package = "/bin/false"
+        self.mc.cache_dir = None
+        self.assertRaises(RuntimeError, self.mc.create_module_packages,
+                          self.sources, False)
+
+    def test_unreadable_source(self):
+        # A source that cannot be read fails just that module.
+        sources = self.sources + [os.path.join(self.dir, "missing.te")]
+        try:
+            self.mc.create_module_packages(sources, refpolicy=False)
+        except RuntimeError as e:
+            self.assertTrue("missing.te" in str(e))
+        else:
+            self.fail("no RuntimeError")
+        for fn in self.sources:
+            os.stat(fn[:-3] + ".pp")
+
+class TestRefpolicyPackages(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        # A fake make that fails if another build is running in the
+        # same directory, like two builds sharing the refpolicy tmp/,
+        # or if the module source is missing.
+        self.log = os.path.join(self.dir, "log")
+        self.make = os.path.join(self.dir, "make")
+        fd = open(self.make, "w")
+        fd.write("#!/bin/sh\necho \"$@\" >> %s\ncd \"$2\"\n"
+                 "mkdir busy 2>/dev/null || exit 1\nsleep 0.2\n"
+                 "for x; do :; done\n[ -f \"${x%%.pp}.te\" ] || exit 1\n"
+                 "echo pkg > \"$x\"\nrmdir busy\n" % self.log)
+        fd.close()
+        os.chmod(self.make, 0o755)
+
+        self.headers = os.path.join(self.dir, "include")
+        os.mkdir(self.headers)
+        self.write(os.path.join(self.headers, "all_interfaces.conf"), "")
+
+        self.mc = module.ModuleCompiler()
+        self.mc.make = self.make
+        self.mc.refpol_makefile = self.make
+        self.mc.headers = self.headers
+        self.mc.cache_dir = os.path.join(self.dir, "cache")
+        self.mc.jobs = 4
+
+        self.sources = []
+        for i in range(3):
+            fn = os.path.join(self.dir, "mod%d.te" % i)
+            self.write(fn, "policy_module(mod%d, 1.0)\n" % i)
+            self.sources.append(fn)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, fn, data):
+        fd = open(fn, "w")
+        fd.write(data)
+        fd.close()
+
+    def test_same_directory(self):
+        ret = self.mc.create_module_packages(self.sources, refpolicy=True)
+        self.assertEqual([x[2] for x in ret], [False] * 3)
+        for sourcename, packagename, cached in ret:
+            os.stat(packagename)
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ["cache", "include", "log", "make"] +
+                         ["mod%d.%s" % (i, x) for i in range(3) for x in ("pp", "te")])
+
+    def test_headers_key(self):
+        key = self.mc.cache_key(self.sources[0])
+        self.assertEqual(self.mc.cache_key(self.sources[0]), key)
+        self.assertNotEqual(self.mc.cache_key(self.sources[0], refpolicy=False), key)
+
+        self.write(os.path.join(self.headers, "new.if"), "")
+        self.assertNotEqual(self.mc.cache_key(self.sources[0]), key)
+
+        # A changed header rebuilds the cached modules.
+        self.mc.create_module_packages(self.sources, refpolicy=True)
+        ret = self.mc.create_module_packages(self.sources, refpolicy=True)
+        self.assertEqual([x[2] for x in ret], [True] * 3)
+        self.write(os.path.join(self.headers, "all_interfaces.conf"), "changed\n")
+        ret = self.mc.create_module_packages(self.sources, refpolicy=True)
+        self.assertEqual([x[2] for x in ret], [False] * 3)
+
+        # Headers are identified by their contents, not size and mtime.
+        key = self.mc.cache_key(self.sources[0])
+        st = os.stat(os.path.join(self.headers, "all_interfaces.conf"))
+        self.write(os.path.join(self.headers, "all_interfaces.conf"), "CHANGED\n")
+        os.utime(os.path.join(self.headers, "all_interfaces.conf"), (st.st_atime, st.st_mtime))
+        self.assertNotEqual(self.mc.cache_key(self.sources[0]), key)
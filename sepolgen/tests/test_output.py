@@ -0,0 +1,83 @@
+# Copyright (C) 2006 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; version 2 only
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import unittest
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import sepolgen.access as access
+import sepolgen.output as output
+import sepolgen.refpolicy as refpolicy
+
+def avrule(src, tgt, obj_class, perms):
+    return refpolicy.AVRule(access.AccessVector([src, tgt, obj_class] + perms))
+
+class CountingFile(StringIO):
+    def __init__(self):
+        StringIO.__init__(self)
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return StringIO.write(self, s)
+
+class TestSortFilter(unittest.TestCase):
+    def test_sort(self):
+        m = refpolicy.Module()
+        ifcall = refpolicy.InterfaceCall(ifname="files_read_etc_files")
+        ifcall.args.append("foo_t")
+        m.children.append(ifcall)
+        m.children.append(avrule("foo_t", "etc_t", "file", ["read"]))
+        m.children.append(avrule("bar_t", "etc_t", "file", ["read"]))
+        decl = refpolicy.ModuleDeclaration()
+        decl.name = "local"
+        decl.version = "1.0"
+        m.children.append(decl)
+        m.children.append(avrule("foo_t", "bar_t", "dir", ["search"]))
+
+        output.sort_filter(m)
+
+        self.assertTrue(m.children[0] is decl)
+        rules = [x for x in m.children
+                 if isinstance(x, (refpolicy.AVRule, refpolicy.InterfaceCall))]
+        self.assertEqual([output.rule_key(x)[0] for x in rules],
+                         [("bar_t",), ("foo_t",), ("foo_t",), ("foo_t",)])
+        self.assertTrue(rules[-1] is ifcall)
+        self.assertEqual(rules[1].to_string(), "allow foo_t bar_t:dir search;")
+
+        # Every statement appears exactly once.
+        self.assertEqual(len(set([id(x) for x in m.children])), len(m.children))
+        self.assertEqual(len(rules), 4)
+
+class TestModuleWriter(unittest.TestCase):
+    def test_chunks(self):
+        m = refpolicy.Module()
+        for i in range(100):
+            m.children.append(avrule("foo_t", "bar%d_t" % i, "file", ["read"]))
+
+        w = output.ModuleWriter()
+        w.sort = False
+        w.chunk_size = 1024
+        f = CountingFile()
+        w.write(m, f)
+
+        lines = f.getvalue().split("\n")
+        self.assertEqual(lines[1], "allow foo_t bar0_t:file read;")
+        self.assertEqual(lines[100], "allow foo_t bar99_t:file read;")
+        self.assertTrue(1 < f.writes < 10)
@@ -18,7 +18,10 @@
 #
 
 import unittest
+import sepolgen.access as access
 import sepolgen.policygen as policygen
+import sepolgen.refparser as refparser
+import sepolgen.refpolicy as refpolicy
 
 class PolicyGenerator(unittest.TestCase):
     def __init__(self):
@@ -29,3 +32,120 @@ class PolicyGenerator(unittest.TestCase):
 
 
 
+
+class TestWriteTargets(unittest.TestCase):
+    names = ["seinfo", "sesearch", "ATTRIBUTE", "ALLOW", "SCONTEXT",
+             "TCONTEXT", "CLASS", "PERMS"]
+
+    def setUp(self):
+        # Stand in for the setools queries so the test does not
+        # depend on the installed policy.
+        self.saved = {}
+        for n in self.names:
+            self.saved[n] = getattr(policygen, n, None)
+        self.searches = []
+
+        def seinfo(kind, name=None):
+            return [{"types": ["foo_t"]}]
+
+        def sesearch(kinds, query):
+            self.searches.append(query)
+            return [{"tcontext": "foo_t"}, {"tcontext": "bar_t"}]
+
+        policygen.seinfo = seinfo
+        policygen.sesearch = sesearch
+        policygen.ATTRIBUTE = "attribute"
+        policygen.ALLOW = "allow"
+        policygen.SCONTEXT = "scontext"
+        policygen.TCONTEXT = "tcontext"
+        policygen.CLASS = "class"
+        policygen.PERMS = "permlist"
+
+    def tearDown(self):
+        for n in self.names:
+            if self.saved[n] is None:
+                delattr(policygen, n)
+            else:
+                setattr(policygen, n, self.saved[n])
+
+    def test_memoized(self):
+        avs = access.AccessVectorSet()
+        for i in range(10):
+            avs.add("foo_t", "tgt%d_t" % i, "file", ["open", "write"])
+        avs.add("foo_t", "baz_t", "file", ["read"])
+
+        g = policygen.PolicyGenerator()
+        g.add_access(avs)
+        g.add_access(avs)
+        self.assertEqual(len(self.searches), 1)
+
+        rules = list(g.module.avrules())
+        self.assertEqual(len(rules), 22)
+        for r in rules:
+            if "write" in r.perms:
+                self.assertTrue("bar_t" in r.comment)
+                self.assertFalse("foo_t\n" in r.comment)
+            else:
+                self.assertFalse("can write" in r.comment)
+
+def expand(rules, spt=None):
+    # The (source, target, class, perm) tuples allowed by the rules.
+    s = set()
+    for r in rules:
+        perms = set()
+        for p in r.perms:
+            if spt and spt.has_key(p):
+                perms.update(spt.by_name(p))
+            else:
+                perms.add(p)
+        for src in r.src_types:
+            for tgt in r.tgt_types:
+                for c in r.obj_classes:
+                    for p in perms:
+                        s.add((src, tgt, c, p))
+    return s
+
+class TestMinimize(unittest.TestCase):
+    def setUp(self):
+        avs = access.AccessVectorSet()
+        for t in ["a_t", "b_t", "c_t"]:
+            for c in ["file", "lnk_file"]:
+                avs.add("foo_t", t, c, ["read", "getattr", "open"])
+        avs.add("foo_t", "a_t", "dir", ["search"])
+        avs.add("foo_t", "b_t", "dir", ["search"])
+        avs.add("bar_t", "a_t", "file", ["read", "getattr", "open"])
+        self.avs = avs
+
+    def test_minimize(self):
+        g = policygen.PolicyGenerator()
+        g.add_access(self.avs)
+        full = expand(g.module.avrules())
+
+        rules = policygen.minimize_rules(list(g.module.avrules()))
+        self.assertEqual(len(rules), 3)
+        self.assertEqual(expand(rules), full)
+
+    def test_get_module(self):
+        spt = refpolicy.SupportMacros()
+        refparser.parse("define(`read_file_perms',`{ getattr open read ioctl }')\n"
+                        "define(`getattr_file_perms',`{ getattr }')\n"
+                        "define(`open_read_perms',`{ open read }')\n", spt)
+
+        g = policygen.PolicyGenerator()
+        g.set_gen_requires(True)
+        g.set_gen_minimize(True, spt)
+        g.add_access(self.avs)
+        full = expand(self.avs_rules())
+        m = g.get_module()
+
+        rules = list(m.avrules())
+        self.assertEqual(len(rules), 3)
+        self.assertEqual(expand(rules, spt), full)
+        for r in rules:
+            if "file" in r.obj_classes:
+                self.assertEqual(r.perms, refpolicy.IdSet(["open_read_perms", "getattr"]))
+        for r in m.requires():
+            self.assertEqual(r.obj_classes["file"], refpolicy.IdSet(["read", "getattr", "open"]))
+
+    def avs_rules(self):
+        return [refpolicy.AVRule(av) for av in self.avs]
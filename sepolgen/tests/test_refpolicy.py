@@ -128,6 +128,25 @@ class TestTypeRule(unittest.TestCase):
         self.assertEqual(a.to_string(), "type_transition foo_t bar_exec_t:process bar_t;")
 
 
+class TestInterfaceCall(unittest.TestCase):
+    def test_key(self):
+        a = refpolicy.InterfaceCall(ifname="files_read_etc")
+        a.args = ["foo_t", ["file", "dir"]]
+        b = refpolicy.InterfaceCall(ifname="files_read_etc")
+        b.args = ["foo_t", ["dir", "file"]]
+        self.assertEqual(a.key(), b.key())
+        self.assertTrue(a.matches(b))
+        d = { a.key() : a }
+        self.assertTrue(b.key() in d)
+
+        b.args = ["bar_t", ["dir", "file"]]
+        self.assertNotEqual(a.key(), b.key())
+        self.assertFalse(a.matches(b))
+
+        b.ifname = "files_write_etc"
+        b.args = a.args
+        self.assertFalse(a.matches(b))
+
 class TestParseNode(unittest.TestCase):
     def test_walktree(self):
         # Construct a small tree
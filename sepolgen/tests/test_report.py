@@ -0,0 +1,85 @@
+# Copyright (C) 2006 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; version 2 only
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+
+import unittest
+import json
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import sepolgen.audit as audit
+import sepolgen.report as report
+
+from test_audit import log1, log2, granted1
+
+class TestDenialReport(unittest.TestCase):
+    def setUp(self):
+        parser = audit.AuditParser()
+        parser.parse_string(log1)
+        self.r = report.DenialReport(max_samples=1)
+        self.r.add_msgs(parser.avc_msgs)
+
+    def test_groups(self):
+        self.assertEqual(self.r.total, 11)
+        groups = self.r.sorted_groups()
+        self.assertEqual(len(groups), 2)
+        self.assertEqual([g.count for g in groups], [6, 5])
+        self.assertEqual(groups[0].perms, ("dac_read_search",))
+        self.assertEqual(groups[0].first, 1158584779.745)
+        self.assertEqual(groups[0].last, 1158584780.801)
+        self.assertEqual(groups[0].samples["comm"], ["sh"])
+
+        self.assertEqual(len(self.r.sorted_groups(top=1)), 1)
+
+    def test_output(self):
+        out = StringIO()
+        self.r.to_file(out, "json", top=1)
+        d = json.loads(out.getvalue())
+        self.assertEqual(d["unique"], 2)
+        self.assertEqual(len(d["groups"]), 1)
+        self.assertEqual(d["groups"][0]["count"], 6)
+
+        out = StringIO()
+        self.r.to_file(out)
+        self.assertTrue(out.getvalue().startswith("11 denials, 2 unique\n"))
+        self.assertTrue("6 x user_u:system_r:vpnc_t:s0" in out.getvalue())
+
+class TestReportSink(unittest.TestCase):
+    def test_sink(self):
+        # Parsing into the report gives the same groups as adding the
+        # parsed messages, without keeping them.
+        r = report.DenialReport(max_samples=1, avc_filter=audit.DenialFilter())
+        parser = audit.AuditParser(avc_sink=r)
+        parser.parse_string(log1 + "\n" + granted1)
+        self.assertEqual(parser.avc_msgs, [])
+        self.assertEqual(parser.path_msgs, [])
+
+        parser = audit.AuditParser()
+        parser.parse_string(log1)
+        expected = report.DenialReport(max_samples=1)
+        expected.add_msgs(parser.avc_msgs)
+        self.assertEqual(r.to_dict(), expected.to_dict())
+
+    def test_sink_path(self):
+        r = report.DenialReport()
+        parser = audit.AuditParser(avc_sink=r)
+        parser.parse_string(log2)
+        self.assertEqual(r.total, 2)
+        for g in r.sorted_groups():
+            self.assertEqual(g.samples["path"], ["/usr/lib/sa/sa1"])
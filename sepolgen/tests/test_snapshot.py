@@ -0,0 +1,134 @@
+# Copyright (C) 2006 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; version 2 only
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import unittest
+import os
+import shutil
+import tempfile
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import sepolgen.interfaces as interfaces
+import sepolgen.refparser as refparser
+import sepolgen.refpolicy as refpolicy
+import sepolgen.snapshot as snapshot
+
+from test_interfaces import interface_example
+
+def tree_lines(node):
+    # Set iteration order is not preserved, so compare the sets in
+    # the rules rather than their string representations.
+    l = []
+    for x, depth in refpolicy.walktree(node, showdepth=True):
+        if isinstance(x, refpolicy.AVRule):
+            l.append((depth, x.src_types, x.tgt_types, x.obj_classes, x.perms))
+        else:
+            l.append((depth, x.__class__.__name__))
+    return l
+
+def ifs_text(headers):
+    i = interfaces.InterfaceSet()
+    i.add_headers(headers)
+    out = StringIO()
+    i.to_file(out)
+    return sorted([sorted(l.replace(",", " ").split()) for l in out.getvalue().split("\n")])
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.headers = refpolicy.Headers()
+        self.headers.children.append(refparser.parse(interface_example))
+
+    def roundtrip(self, key=""):
+        out = StringIO()
+        snapshot.to_file(self.headers, out, key)
+        return snapshot.from_file(StringIO(out.getvalue()), key)
+
+    def test_roundtrip(self):
+        h = self.roundtrip()
+        self.assertTrue(isinstance(h, refpolicy.Headers))
+        self.assertEqual(tree_lines(h), tree_lines(self.headers))
+        self.assertEqual(ifs_text(h), ifs_text(self.headers))
+
+        for avrule in h.avrules():
+            self.assertTrue(isinstance(avrule.perms, refpolicy.IdSet))
+        for i in h.interfaces():
+            for c in i.children:
+                self.assertTrue(c.parent is i)
+
+    def test_key(self):
+        out = StringIO()
+        snapshot.to_file(self.headers, out, "abc")
+        self.assertRaises(ValueError, snapshot.from_file,
+                          StringIO(out.getvalue()), "def")
+        self.assertRaises(ValueError, snapshot.from_file,
+                          StringIO("not a snapshot\n{}"))
+
+    def test_reject_foreign_objects(self):
+        bad = StringIO("%s %d \n{\"o\":[\"StringIO\",{},false]}\n" %
+                       (snapshot.MAGIC, snapshot.SNAPSHOT_VERSION))
+        self.assertRaises(ValueError, snapshot.from_file, bad)
+
+    def test_save_load(self):
+        d = tempfile.mkdtemp()
+        try:
+            fn = os.path.join(d, "test.if")
+            f = open(fn, "w")
+            f.write(interface_example)
+            f.close()
+            key = snapshot.headers_key([fn])
+            self.assertEqual(snapshot.load(key, d), None)
+            self.assertTrue(snapshot.save(self.headers, key, d))
+            h = snapshot.load(key, d)
+            self.assertEqual(tree_lines(h), tree_lines(self.headers))
+
+            f = open(fn, "a")
+            f.write("\n")
+            f.close()
+            self.assertNotEqual(snapshot.headers_key([fn]), key)
+            self.assertNotEqual(snapshot.headers_key([fn], expand=False),
+                                snapshot.headers_key([fn]))
+        finally:
+            shutil.rmtree(d)
+
+    def test_prune(self):
+        d = tempfile.mkdtemp()
+        try:
+            other = os.path.join(d, "other")
+            f = open(other, "w")
+            f.close()
+            name = snapshot.headers_name("/usr/share/selinux/devel/include")
+            other_name = snapshot.headers_name("/usr/share/selinux/devel/include", expand=False)
+            self.assertNotEqual(name, other_name)
+            old_key = "0" * 64
+            self.assertTrue(snapshot.save(self.headers, old_key, d, name))
+            other_key = "2" * 64
+            self.assertTrue(snapshot.save(self.headers, other_key, d, other_name))
+            key = "1" * 64
+            self.assertTrue(snapshot.save(self.headers, key, d, name))
+
+            # Only the older snapshot with the same name is removed.
+            self.assertEqual(snapshot.load(old_key, d, name), None)
+            self.assertNotEqual(snapshot.load(key, d, name), None)
+            self.assertNotEqual(snapshot.load(other_key, d, other_name), None)
+            self.assertEqual(sorted(os.listdir(d)),
+                             sorted(["other",
+                                     os.path.basename(snapshot.snapshot_name(key, d, name)),
+                                     os.path.basename(snapshot.snapshot_name(other_key, d, other_name))]))
+        finally:
+            shutil.rmtree(d)
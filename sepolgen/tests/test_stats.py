@@ -0,0 +1,81 @@
+# Copyright (C) 2006 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; version 2 only
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+
+import unittest
+import json
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import sepolgen.audit as audit
+from sepolgen.stats import stats, Stats
+
+from test_audit import log1
+
+class TestStats(unittest.TestCase):
+    def test_phases(self):
+        s = Stats()
+        with s.phase("a"):
+            with s.phase("b"):
+                pass
+        with s.phase("a"):
+            pass
+        s.count("lines", 10)
+        s.count("lines")
+
+        d = s.to_dict()
+        self.assertEqual([p["name"] for p in d["phases"]], ["b", "a"])
+        self.assertEqual(d["phases"][1]["calls"], 2)
+        self.assertEqual(d["counters"], {"lines": 11})
+
+        out = StringIO()
+        s.to_file(out, "json")
+        self.assertEqual(json.loads(out.getvalue())["counters"]["lines"], 11)
+
+        s.reset()
+        self.assertEqual(s.to_dict()["phases"], [])
+
+    def test_disabled(self):
+        s = Stats(enabled=False)
+        with s.phase("a"):
+            s.count("lines")
+        self.assertEqual(s.to_dict()["phases"], [])
+        self.assertEqual(s.to_dict()["counters"], {})
+
+        # The module instance only records once it is enabled.
+        audit.avcdict.clear()
+        stats.reset()
+        audit.AuditParser().parse_string(log1)
+        self.assertEqual(stats.to_dict()["counters"], {})
+
+    def test_audit_counters(self):
+        audit.avcdict.clear()
+        stats.reset()
+        stats.enabled = True
+        try:
+            parser = audit.AuditParser()
+            parser.parse_string(log1)
+        finally:
+            stats.enabled = False
+
+        c = stats.to_dict()["counters"]
+        self.assertEqual(c["lines"], len(log1.split("\n")))
+        self.assertEqual(c["avcdict_misses"], 2)
+        self.assertEqual(c["avcdict_hits"], 9)
+        self.assertEqual(stats.rates()["avcdict_hit_rate"], 9 / 11.0)
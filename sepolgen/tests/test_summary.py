@@ -0,0 +1,67 @@
+# Copyright (C) 2006 Red Hat
+# see file 'COPYING' for use and warranty information
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; version 2 only
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+
+import unittest
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import sepolgen.audit as audit
+import sepolgen.summary as summary
+
+from test_audit import log1, log2
+
+def parse(log, host):
+    parser = audit.AuditParser()
+    parser.parse_string(log)
+    return summary.from_parser(parser, host)
+
+class TestSummary(unittest.TestCase):
+    def test_from_parser(self):
+        s = parse(log1, "a")
+        self.assertEqual(len(s), 1)
+        e = list(s.entries.values())[0]
+        self.assertEqual(e.count, 11)
+        self.assertEqual(e.hosts, set(["a"]))
+        self.assertEqual(len(s.to_access()), 1)
+
+    def test_merge(self):
+        a = parse(log1, "a")
+        b = parse(log2, "b")
+        c = parse(log1, "c")
+
+        m1 = summary.merge([summary.merge([a, b]), c])
+        m2 = summary.merge([a, summary.merge([c, b])])
+        self.assertEqual(m1.to_dict(), m2.to_dict())
+        self.assertEqual(m1.hosts, set(["a", "b", "c"]))
+        self.assertEqual(len(m1.to_access()), 2)
+        for e in m1.entries.values():
+            if e.hosts == set(["a", "c"]):
+                self.assertEqual(e.count, 22)
+
+    def test_file(self):
+        s = summary.merge([parse(log1, "a"), parse(log2, "b")])
+        out = StringIO()
+        s.to_file(out)
+        s2 = summary.Summary()
+        s2.from_file(StringIO(out.getvalue()))
+        self.assertEqual(s.to_dict(), s2.to_dict())
+
+        self.assertRaises(ValueError, s2.from_file, StringIO("{}"))
+        self.assertRaises(ValueError, s2.from_file, StringIO("not json"))